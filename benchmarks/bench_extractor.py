@@ -0,0 +1,69 @@
+"""Микробенчмарк извлечения названия и цены: BeautifulSoup и поиск маркеров.
+
+Страницы из tests/fixtures дополняются разметкой до размера реальной
+карточки товара (маркеры оказываются в начале страницы, как на Маркете).
+
+    python benchmarks/bench_extractor.py [--size-kb 1500] [--repeat 5]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from extractor import FastExtractor, IncrementalExtractor, SoupExtractor  # noqa: E402
+
+FIXTURES = ROOT / "tests" / "fixtures"
+FILLER = '<div class="_2kzrS" data-zone-name="snippet"><a href="/product/1"><span>Похожий товар</span></a></div>\n'.encode()
+
+
+def padded(body: bytes, size: int) -> bytes:
+    """Страница с дополнительной разметкой после карточки товара."""
+    marker = body.rfind(b"<footer")
+    if marker < 0:
+        marker = len(body)
+    filler = FILLER * max(0, (size - len(body)) // len(FILLER))
+    return body[:marker] + filler + body[marker:]
+
+
+def incremental(body: bytes, chunk_size: int = 65536):
+    extractor = IncrementalExtractor()
+    for start in range(0, len(body), chunk_size):
+        if extractor.feed(body[start:start + chunk_size]):
+            break
+    return extractor.result()
+
+
+def measure(func, body: bytes, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(body)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-kb", type=int, default=1500, help="размер страницы, КБ")
+    parser.add_argument("--repeat", type=int, default=5, help="число повторов (берется лучшее время)")
+    args = parser.parse_args()
+
+    soup = SoupExtractor()
+    fast = FastExtractor(fallback=soup)
+    print(f"{'страница':<24} {'soup, мс':>10} {'fast, мс':>10} {'поток, мс':>10} {'ускорение':>10}")
+    for page in sorted(FIXTURES.glob("product_*.html")):
+        body = padded(page.read_bytes(), args.size_kb * 1024)
+        soup_time = measure(soup.extract, body, args.repeat)
+        fast_time = measure(fast.extract, body, args.repeat)
+        stream_time = measure(incremental, body, args.repeat)
+        print(
+            f"{page.name:<24} {soup_time * 1000:>10.1f} {fast_time * 1000:>10.2f} "
+            f"{stream_time * 1000:>10.2f} {soup_time / fast_time:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
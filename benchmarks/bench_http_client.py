@@ -0,0 +1,117 @@
+"""Бенчмарк задержки запроса: новая сессия aiohttp на каждый запрос и общий HttpClient.
+
+Запросы идут к локальному серверу-заглушке, отдающему страницу товара из
+tests/fixtures. С --tls сервер работает по HTTPS с самоподписанным
+сертификатом (нужен openssl), что ближе к запросам к Яндекс.Маркету.
+
+    python benchmarks/bench_http_client.py [--requests 300] [--concurrency 10] [--tls]
+"""
+import argparse
+import asyncio
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+from http_client import HttpClient  # noqa: E402
+
+PAGE = (ROOT / "tests" / "fixtures" / "product_simple.html").read_bytes()
+
+
+def self_signed_context(directory: str) -> ssl.SSLContext:
+    cert, key = f"{directory}/cert.pem", f"{directory}/key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+        check=True, capture_output=True
+    )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+async def start_server(ssl_context):
+    async def handler(request):
+        return web.Response(body=PAGE, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/product/{id}", handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "localhost", 0, ssl_context=ssl_context)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, port
+
+
+async def run(fetch, urls, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(url):
+        async with semaphore:
+            started = time.perf_counter()
+            await fetch(url)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(url) for url in urls))
+    return latencies, time.perf_counter() - started
+
+
+def report(name: str, latencies, total: float) -> None:
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{name:<22} среднее {statistics.mean(latencies) * 1000:7.2f} мс  "
+        f"p50 {statistics.median(latencies) * 1000:7.2f} мс  p99 {p99 * 1000:7.2f} мс  "
+        f"всего {total:6.2f} с"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--tls", action="store_true", help="HTTPS с самоподписанным сертификатом")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        server_context = self_signed_context(directory) if args.tls else None
+        runner, port = await start_server(server_context)
+    scheme = "https" if args.tls else "http"
+    urls = [f"{scheme}://localhost:{port}/product/{i}" for i in range(args.requests)]
+    client_ssl = False if args.tls else None
+
+    async def per_request_session(url):
+        # Поведение до общего клиента: новая сессия и соединение на каждый товар
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url, ssl=client_ssl) as response:
+                await response.read()
+
+    client = HttpClient(limit_per_host=args.concurrency)
+    await client.start()
+
+    async def shared_client(url):
+        async with client.session.get(url, ssl=client_ssl) as response:
+            await response.read()
+
+    try:
+        report("новая сессия", *await run(per_request_session, urls, args.concurrency))
+        report("общий HttpClient", *await run(shared_client, urls, args.concurrency))
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""Бенчмарк задержки обработчиков во время разбора страниц: без пула и с пулом.
+
+Пока ParserPool разбирает страницы эталонным извлекателем BeautifulSoup
+(как при проверке цен), цикл событий каждые 10 мс выполняет
+«обработчик» и замеряет, насколько он опоздал. Сравниваются разбор в
+цикле событий (kind=none), в пуле потоков и в пуле процессов.
+
+    python benchmarks/bench_parser_pool.py [--pages 40] [--size-kb 500] [--workers 2]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from parser_pool import ParserPool  # noqa: E402
+
+FIXTURE = ROOT / "tests" / "fixtures" / "product_simple.html"
+FILLER = '<div data-zone-name="snippet"><a href="/product/1"><span>Похожий товар</span></a></div>\n'.encode()
+HANDLER_PERIOD = 0.01
+
+
+def page(size: int) -> bytes:
+    body = FIXTURE.read_bytes()
+    marker = body.rfind(b"<footer")
+    return body[:marker] + FILLER * (size // len(FILLER)) + body[marker:]
+
+
+async def handler_latencies(stop: asyncio.Event):
+    """Опоздания периодического обработчика относительно расписания."""
+    loop = asyncio.get_running_loop()
+    latencies = []
+    while not stop.is_set():
+        expected = loop.time() + HANDLER_PERIOD
+        await asyncio.sleep(HANDLER_PERIOD)
+        latencies.append(max(0.0, loop.time() - expected))
+    return latencies
+
+
+async def measure(kind: str, body: bytes, pages: int, workers: int):
+    pool = ParserPool("soup", kind=kind, workers=workers, queue_depth=workers * 2)
+    # Пул запускается до замера, чтобы не учитывать старт процессов
+    await pool.extract(body[:1024])
+    stop = asyncio.Event()
+    probe = asyncio.create_task(handler_latencies(stop))
+
+    async def parse():
+        async with pool.slot():
+            return await pool.extract(body)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(parse() for _ in range(pages)))
+    total = time.perf_counter() - started
+    stop.set()
+    latencies = sorted(await probe)
+    pool.shutdown()
+    assert all(results)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else float("inf")
+    return total, latencies[len(latencies) // 2] if latencies else float("inf"), p99, len(latencies)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--size-kb", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    body = page(args.size_kb * 1024)
+    print(f"{'режим':<10} {'разбор, с':>10} {'замеров':>8} {'p50 задержки, мс':>17} {'p99 задержки, мс':>17}")
+    for kind in ("none", "thread", "process"):
+        total, p50, p99, samples = await measure(kind, body, args.pages, args.workers)
+        print(f"{kind:<10} {total:>10.2f} {samples:>8} {p50 * 1000:>17.1f} {p99 * 1000:>17.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""Бенчмарк времени запуска бота до готовности отвечать пользователям.
+
+Замеряется время от запуска процесса до момента, когда импортирован bot.py,
+открыта база и загружен каталог товаров, то есть до начала опроса
+Telegram. Для сравнения тот же запуск выполняется с предварительным
+импортом matplotlib, NumPy и BeautifulSoup, как до ленивой загрузки, а
+также замеряется один импорт aiogram - нижняя граница времени запуска.
+
+    python benchmarks/bench_startup.py [--repeat 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+FLOOR = """
+import aiogram, aiogram.types
+print('ready -', flush=True)
+"""
+
+CHILD = """
+import asyncio, sys
+if {eager}:
+    import matplotlib.pyplot, numpy, bs4
+import bot
+
+async def ready():
+    await bot.db.start()
+    await bot.db.close()
+
+asyncio.run(ready())
+heavy = [name for name in ('matplotlib', 'numpy', 'bs4') if name in sys.modules]
+print('ready', ','.join(heavy) or '-', flush=True)
+"""
+
+
+def start_once(code: str, workdir: str):
+    env = dict(os.environ, TOKEN="123456:bench", YA_COOKIE="bench", METRICS_PORT="0",
+               PYTHONPATH=str(ROOT), PYTHONDONTWRITEBYTECODE="1")
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", code],
+        cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    line = process.stdout.readline().split()
+    elapsed = time.perf_counter() - started
+    process.wait()
+    if not line or line[0] != "ready":
+        raise RuntimeError("бот не запустился")
+    return elapsed, line[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Первый запуск прогревает кэш файловой системы и байткод
+        start_once(CHILD.format(eager=False), workdir)
+        runs = (
+            ("только aiogram", FLOOR),
+            ("ленивые импорты", CHILD.format(eager=False)),
+            ("все импорты сразу", CHILD.format(eager=True)),
+        )
+        for name, code in runs:
+            timings = []
+            for _ in range(args.repeat):
+                elapsed, heavy = start_once(code, workdir)
+                timings.append(elapsed)
+            print(
+                f"{name:<20} медиана {statistics.median(timings) * 1000:7.0f} мс, "
+                f"минимум {min(timings) * 1000:7.0f} мс, загружены: {heavy}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Бенчмарк потокового чтения страницы: ранний разрыв соединения и полное чтение.
+
+Потоковое чтение закрывает соединение, как только найдены название и цена,
+поэтому следующий запрос открывает новое соединение (TCP и TLS). Полное
+чтение дочитывает страницу и возвращает соединение в пул. Что выгоднее,
+зависит от размера страницы, пропускной способности и задержки сети,
+поэтому сервер-заглушка ограничивает скорость отдачи (--mbit) и добавляет
+задержку установки соединения (--handshake-ms) на каждое новое соединение.
+
+    python benchmarks/bench_streaming.py [--requests 20] [--size-kb 2000] [--mbit 50] [--handshake-ms 100]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from aiohttp import web  # noqa: E402
+
+from extractor import FastExtractor, IncrementalExtractor  # noqa: E402
+from http_client import HttpClient  # noqa: E402
+
+FIXTURE = ROOT / "tests" / "fixtures" / "product_simple.html"
+FILLER = '<div data-zone-name="snippet"><a href="/product/1"><span>Похожий товар</span></a></div>\n'.encode()
+CHUNK_SIZE = 65536
+
+
+def page(size: int) -> bytes:
+    body = FIXTURE.read_bytes()
+    marker = body.rfind(b"<footer")
+    return body[:marker] + FILLER * (size // len(FILLER)) + body[marker:]
+
+
+async def start_server(body: bytes, mbit: float, handshake: float):
+    seen = set()
+
+    async def handler(request):
+        transport = request.transport
+        if id(transport) not in seen:
+            # Новое соединение: имитация TCP- и TLS-рукопожатия
+            seen.add(id(transport))
+            await asyncio.sleep(handshake)
+        response = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+        response.content_length = len(body)
+        await response.prepare(request)
+        delay = CHUNK_SIZE * 8 / (mbit * 1_000_000) if mbit else 0
+        try:
+            for start in range(0, len(body), CHUNK_SIZE):
+                await response.write(body[start:start + CHUNK_SIZE])
+                await asyncio.sleep(delay)
+        except (ConnectionResetError, RuntimeError):
+            pass
+        return response
+
+    app = web.Application()
+    app.router.add_get("/product/{id}", handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner, runner.addresses[0][1], seen
+
+
+async def streaming(client: HttpClient, url: str) -> int:
+    async with client.session.get(url) as response:
+        incremental = IncrementalExtractor()
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            if incremental.feed(chunk):
+                break
+        if not response.content.at_eof():
+            response.close()
+        assert incremental.result()
+        return incremental.bytes_fed
+
+
+async def full_read(client: HttpClient, url: str) -> int:
+    async with client.session.get(url) as response:
+        body = await response.read()
+        assert FastExtractor().extract(body)
+        return len(body)
+
+
+async def measure(fetch, body: bytes, args):
+    runner, port, seen = await start_server(body, args.mbit, args.handshake_ms / 1000)
+    client = HttpClient(limit_per_host=1)
+    await client.start()
+    latencies, total_bytes = [], 0
+    try:
+        for i in range(args.requests):
+            started = time.perf_counter()
+            total_bytes += await fetch(client, f"http://127.0.0.1:{port}/product/{i}")
+            latencies.append(time.perf_counter() - started)
+    finally:
+        await client.close()
+        await runner.cleanup()
+    return latencies, total_bytes, len(seen)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--size-kb", type=int, default=2000, help="размер страницы, КБ")
+    parser.add_argument("--mbit", type=float, default=50, help="скорость отдачи, Мбит/с (0 - без ограничения)")
+    parser.add_argument("--handshake-ms", type=float, default=100, help="задержка нового соединения, мс")
+    args = parser.parse_args()
+
+    body = page(args.size_kb * 1024)
+    print(f"страница {len(body) / 1024:.0f} КБ, {args.mbit or '∞'} Мбит/с, рукопожатие {args.handshake_ms:.0f} мс")
+    for name, fetch in (("поток + разрыв", streaming), ("полное чтение", full_read)):
+        latencies, total_bytes, connections = await measure(fetch, body, args)
+        print(
+            f"{name:<16} среднее {statistics.mean(latencies) * 1000:7.1f} мс, "
+            f"прочитано {total_bytes / len(latencies) / 1024:7.0f} КБ на запрос, соединений {connections}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""Бенчмарк записи цен: коммит на каждый товар и пакетная запись одной транзакцией.
+
+Создается синтетическая база со 100 тыс. товаров (и записями истории), затем
+для части товаров цена обновляется через Database.update_price (коммит на
+строку) и через Database.update_prices (пакеты по --batch строк).
+
+    python benchmarks/bench_write_behind.py [--products 100000] [--updates 5000] [--batch 500] [--synchronous FULL]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+# config.py требует обязательные переменные окружения
+os.environ.setdefault("TOKEN", "123456:bench")
+os.environ.setdefault("YA_COOKIE", "bench")
+
+from database import TIMESTAMP_FORMAT, Database  # noqa: E402
+
+
+def populate(db: Database, products: int) -> None:
+    with db.conn:
+        db.conn.executemany(
+            "INSERT INTO prices (user_id, url, name, last_price, threshold) VALUES (?, ?, ?, ?, ?)",
+            ((i % 1000, f"https://market.yandex.ru/product/{i}", f"Товар {i}", 1000, 500) for i in range(products))
+        )
+        db.conn.executemany(
+            "INSERT INTO price_history (product_id, price) VALUES (?, ?)",
+            ((i + 1, 1000) for i in range(products))
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--synchronous", choices=("OFF", "NORMAL", "FULL"), default="NORMAL",
+                        help="режим PRAGMA synchronous (в боте NORMAL; FULL - fsync на каждый коммит)")
+    args = parser.parse_args()
+    # Сообщения о каждой записи не должны влиять на замер
+    logging.getLogger("database").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(os.path.join(directory, "bench.db"))
+        db.conn.execute(f"PRAGMA synchronous={args.synchronous}")
+        populate(db, args.products)
+        ids = random.sample(range(1, args.products + 1), args.updates)
+
+        started = time.perf_counter()
+        for product_id in ids:
+            db.update_price(product_id, random.randint(500, 1500))
+        per_row = time.perf_counter() - started
+
+        timestamp = datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+        rows = [(product_id, random.randint(500, 1500), timestamp) for product_id in ids]
+        started = time.perf_counter()
+        for start in range(0, len(rows), args.batch):
+            db.update_prices(rows[start:start + args.batch])
+        batched = time.perf_counter() - started
+        db.close()
+
+    print(
+        f"товаров в базе: {args.products}, обновлений: {args.updates}, пакет: {args.batch}, "
+        f"synchronous={args.synchronous}"
+    )
+    print(f"коммит на строку: {per_row:7.2f} с ({args.updates / per_row:9.0f} строк/с)")
+    print(f"пакетная запись:  {batched:7.2f} с ({args.updates / batched:9.0f} строк/с)")
+    print(f"ускорение: {per_row / batched:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,61 @@
 import asyncio
 import logging
+import time
 import aiohttp
-from typing import Optional, Dict, List, Tuple
+from typing import AsyncContextManager, Callable, Optional, Dict, List, Tuple
 from aiogram import Bot, Dispatcher, types
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.types import InputFile, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.middleware import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
+from datetime import datetime
 import validators
-import matplotlib.pyplot as plt
-import io
-from config import TOKEN, YA_COOKIE, CHECK_INTERVAL, ADMIN_IDS
-from database import Database
+from config import (
+    TOKEN, YA_COOKIE, CHECK_INTERVAL, ADMIN_IDS, CHECK_CONCURRENCY, CHECK_PER_HOST_LIMIT,
+    HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_DNS_CACHE_TTL, HTTP_KEEPALIVE_TIMEOUT, HTTP_TIMEOUT,
+    HTML_EXTRACTOR, FETCH_STREAMING, FETCH_CHUNK_SIZE, PARSER_POOL, PARSER_WORKERS, PARSER_QUEUE_DEPTH,
+    DB_READERS, DB_WRITE_BATCH_SIZE, DB_WRITE_FLUSH_INTERVAL, HISTORY_COMPACT_INTERVAL,
+    GRAPH_WORKERS, GRAPH_CACHE_SIZE, GRAPH_CACHE_MAX_BYTES, NOTIFY_GLOBAL_RATE, NOTIFY_CHAT_RATE, NOTIFY_WORKERS,
+    CHECK_MODE, ADAPTIVE_MIN_INTERVAL, ADAPTIVE_MAX_INTERVAL, CHECK_BUDGET_RPM, CHECK_JITTER,
+    FETCH_CACHE_SIZE, FETCH_CACHE_TTL, FETCH_RETRIES, FETCH_BACKOFF_BASE, FETCH_BACKOFF_MAX,
+    BREAKER_THRESHOLD, BREAKER_RESET_TIMEOUT, BREAKER_MAX_RESET_TIMEOUT, METRICS_HOST, METRICS_PORT,
+    LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_SAMPLE_CHECKS, LOG_SAMPLE_FETCH,
+    SWEEP_PROFILE, SWEEP_PROFILE_OUTPUT, SWEEP_PROFILE_DIR
+)
+from logging_setup import setup_logging
+from database import AsyncDatabase
+from models import Product
+from metrics import CHECKS_TOTAL, PARSE_SECONDS, SWEEP_SECONDS, MetricsServer, registry as metrics_registry
+from sweep import SweepEngine, SweepStats, group_by_url
+from http_client import HttpClient
+from fetch_cache import FetchCache, body_hash
+from resilience import (
+    CAPTCHA, HTTP, NETWORK, PARSE, RATE_LIMIT, CircuitBreaker, FetchError, ResilientFetcher,
+    is_captcha_page, parse_retry_after
+)
+from extractor import IncrementalExtractor
+from parser_pool import ParserPool
+from graphs import GraphRenderer
+from notifications import Notifier
+from scheduling import CheckScheduler
+from profiling import SweepProfiler
 from functools import lru_cache
-from aiohttp import ClientTimeout
-from aiogram.exceptions import TelegramAPIError
 
-# Настройка логирования
-def setup_logging():
-    # Создаем форматтер для логов
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    
-    # Настройка логгера для aiogram
-    aiogram_logger = logging.getLogger('aiogram')
-    aiogram_logger.setLevel(logging.INFO)
-    aiogram_handler = logging.FileHandler('aiogram.log', encoding='utf-8')
-    aiogram_handler.setFormatter(formatter)
-    aiogram_logger.addHandler(aiogram_handler)
-    
-    # Настройка логгера для базы данных
-    db_logger = logging.getLogger('database')
-    db_logger.setLevel(logging.INFO)
-    db_handler = logging.FileHandler('database.log', encoding='utf-8')
-    db_handler.setFormatter(formatter)
-    db_logger.addHandler(db_handler)
-    
-    # Настройка основного логгера бота
-    bot_logger = logging.getLogger('bot')
-    bot_logger.setLevel(logging.INFO)
-    bot_handler = logging.FileHandler('bot.log', encoding='utf-8')
-    bot_handler.setFormatter(formatter)
-    bot_logger.addHandler(bot_handler)
-    
-    # Добавляем вывод в консоль для всех логгеров
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    aiogram_logger.addHandler(console_handler)
-    db_logger.addHandler(console_handler)
-    bot_logger.addHandler(console_handler)
-    
-    return bot_logger, db_logger, aiogram_logger
-
-# Инициализация логгеров
-logger, db_logger, aiogram_logger = setup_logging()
+# Настройка логирования: запись в файлы идет в фоновом потоке
+log_listener = setup_logging(
+    max_bytes=LOG_MAX_BYTES,
+    backup_count=LOG_BACKUP_COUNT,
+    sample_rates={'bot.checks': LOG_SAMPLE_CHECKS, 'bot.fetch': LOG_SAMPLE_FETCH}
+)
+logger = logging.getLogger('bot')
+db_logger = logging.getLogger('database')
+aiogram_logger = logging.getLogger('aiogram')
+# Одна структурированная запись на проверку товара и на загрузку страницы
+check_logger = logging.getLogger('bot.checks')
+fetch_logger = logging.getLogger('bot.fetch')
 
 class AccessMiddleware(BaseMiddleware):
     """Middleware для проверки доступа к боту."""
@@ -83,89 +81,187 @@ bot = Bot(token=TOKEN)
 dp = Dispatcher()
 dp.message.middleware(AccessMiddleware())
 dp.callback_query.middleware(AccessMiddleware())
-db = Database()
+db = AsyncDatabase(
+    readers=DB_READERS,
+    write_batch_size=DB_WRITE_BATCH_SIZE,
+    write_flush_interval=DB_WRITE_FLUSH_INTERVAL
+)
+# Проверка занимает слот только на время запроса (см. check_product_group)
+sweep_engine = SweepEngine(CHECK_CONCURRENCY, CHECK_PER_HOST_LIMIT, limit_workers=False)
+http_client = HttpClient(
+    headers={
+        "Cookie": YA_COOKIE,
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+        "Accept-Language": "ru-RU,ru;q=0.8,en-US;q=0.5,en;q=0.3",
+        "Accept-Encoding": "gzip, deflate, br",
+        "Connection": "keep-alive",
+        "Upgrade-Insecure-Requests": "1",
+        "Referer": "https://market.yandex.ru/"
+    },
+    limit=HTTP_POOL_LIMIT,
+    limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+    dns_cache_ttl=HTTP_DNS_CACHE_TTL,
+    keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+    timeout=HTTP_TIMEOUT
+)
+fetch_cache = FetchCache(FETCH_CACHE_SIZE, FETCH_CACHE_TTL)
+fetcher = ResilientFetcher(
+    CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET_TIMEOUT, BREAKER_MAX_RESET_TIMEOUT),
+    max_retries=FETCH_RETRIES,
+    base_delay=FETCH_BACKOFF_BASE,
+    max_delay=FETCH_BACKOFF_MAX
+)
+parser_pool = ParserPool(HTML_EXTRACTOR, PARSER_POOL, PARSER_WORKERS, PARSER_QUEUE_DEPTH)
+graph_renderer = GraphRenderer(GRAPH_WORKERS, GRAPH_CACHE_SIZE, GRAPH_CACHE_MAX_BYTES)
+notifier = Notifier(bot, NOTIFY_GLOBAL_RATE, NOTIFY_CHAT_RATE, NOTIFY_WORKERS)
+check_scheduler = CheckScheduler(
+    CHECK_MODE,
+    sweep_engine,
+    min_interval=ADAPTIVE_MIN_INTERVAL,
+    max_interval=ADAPTIVE_MAX_INTERVAL,
+    requests_per_minute=CHECK_BUDGET_RPM,
+    jitter=CHECK_JITTER
+)
+metrics_server = MetricsServer(metrics_registry, METRICS_HOST, METRICS_PORT)
+# Профилирование полных проверок, переключается из настроек без перезапуска
+sweep_profiler = SweepProfiler(SWEEP_PROFILE, SWEEP_PROFILE_OUTPUT, SWEEP_PROFILE_DIR)
+# Фоновые задачи, которые нужно остановить при завершении
+background_tasks = set()
+# Период обновления сообщения о ходе ручной проверки, секунд
+PROGRESS_UPDATE_INTERVAL = 3
 
 class ProductStates(StatesGroup):
     waiting_for_url = State()
     waiting_for_threshold = State()
 
 # Получение информации о товаре
-async def get_product_info(url: str) -> Optional[Dict]:
-    """Получение информации о товаре с Яндекс.Маркета."""
+async def get_product_info(url: str, max_age: float = 0, retry: bool = True,
+                           limit: Optional[Callable[[str], AsyncContextManager]] = None) -> Optional[Dict]:
+    """Получение информации о товаре с Яндекс.Маркета.
+
+    Если страница загружалась не раньше max_age секунд назад, результат
+    берется из кэша без запроса. Сетевые ошибки и 429 повторяются с
+    задержкой (при retry=True), капча и 429 приостанавливают запросы к
+    хосту. limit(url) занимает слот параллельности на время каждой
+    попытки. При неудаче возвращается None.
+    """
     try:
-        headers = {
-            "Cookie": YA_COOKIE,
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Accept-Language": "ru-RU,ru;q=0.8,en-US;q=0.5,en;q=0.3",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-            "Referer": "https://market.yandex.ru/"
-        }
-        
-        timeout = ClientTimeout(total=30)
-        logger.info(f"Начало запроса к {url}")
-        
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    logger.info(f"Получен ответ от {url}, размер: {len(html)} байт")
-                    
-                    soup = BeautifulSoup(html, 'html.parser')
-                    
-                    # Получаем название товара
-                    name_elem = soup.find('h1', {'data-auto': 'productCardTitle'})
-                    if not name_elem:
-                        logger.error(f"Не удалось найти название товара на странице {url}")
-                        logger.debug(f"HTML страницы: {html[:500]}...")  # Логируем начало HTML для отладки
-                        return None
-                    name = name_elem.text.strip()
-                    logger.info(f"Найдено название товара: {name}")
-                    
-                    # Получаем цену
-                    price_elem = soup.find('span', {'data-auto': 'snippet-price-current'})
-                    if not price_elem:
-                        logger.error(f"Не удалось найти цену товара на странице {url}")
-                        return None
-                    
-                    try:
-                        # Очищаем цену от всех невидимых символов и пробелов
-                        price_text = price_elem.text.strip()
-                        # Удаляем все невидимые символы Unicode
-                        price_text = ''.join(char for char in price_text if char.isprintable())
-                        # Удаляем все пробелы и символ рубля
-                        price_text = price_text.replace(' ', '').replace('₽', '')
-                        # Преобразуем в число
-                        price = int(price_text)
-                        logger.info(f"Найдена цена товара: {price}₽")
-                    except ValueError as e:
-                        logger.error(f"Ошибка при преобразовании цены '{price_elem.text}': {e}")
-                        logger.error(f"Очищенная цена: '{price_text}'")
-                        return None
-                    
-                    return {
-                        'name': name,
-                        'price': price
-                    }
-                else:
-                    logger.error(f"Ошибка при получении страницы {url}: {response.status}")
-                    logger.error(f"Заголовки ответа: {response.headers}")
-                    return None
-    except aiohttp.ClientError as e:
-        logger.error(f"Ошибка сети при запросе к {url}: {e}")
-        return None
-    except asyncio.TimeoutError as e:
-        logger.error(f"Таймаут при запросе к {url}: {e}")
+        if max_age > 0:
+            product_info = fetch_cache.get_fresh(url, max_age)
+            if product_info:
+                fetch_logger.info("fetch url=%s source=cache", url)
+                return product_info
+        with sweep_profiler.span('fetch'):
+            return await fetcher.call(url, lambda: fetch_product_info(url), retry=retry, limit=limit)
+    except FetchError as e:
+        logger.error(f"Не удалось получить информацию о товаре {url} ({e.kind}): {e}")
         return None
     except Exception as e:
         logger.error(f"Неожиданная ошибка при получении информации о товаре {url}: {e}")
         return None
 
-def get_main_keyboard(user_id: int) -> ReplyKeyboardMarkup:
+async def fetch_product_info(url: str) -> Dict:
+    """Одна попытка загрузки страницы товара. При неудаче - FetchError."""
+    await http_client.start()
+    try:
+        # Условный запрос: неизменившаяся страница вернет 304 без тела
+        async with http_client.session.get(url, headers=fetch_cache.conditional_headers(url)) as response:
+            if 'showcaptcha' in response.url.path:
+                http_client.record(0)
+                raise FetchError(CAPTCHA, "Яндекс.Маркет перенаправил на капчу")
+            if response.status == 304:
+                http_client.record(0)
+                product_info = fetch_cache.revalidated(url)
+                if not product_info:
+                    raise FetchError(HTTP, "Получен ответ 304, но страницы нет в кэше")
+                fetch_logger.info("fetch url=%s status=304 source=revalidated", url)
+                return product_info
+            if response.status == 429:
+                http_client.record(0)
+                raise FetchError(
+                    RATE_LIMIT, "Превышен лимит запросов (429)",
+                    retry_after=parse_retry_after(response.headers.get('Retry-After'))
+                )
+            if response.status != 200:
+                logger.error(f"Заголовки ответа: {response.headers}")
+                raise FetchError(
+                    HTTP, f"Ошибка при получении страницы: {response.status}",
+                    retryable=response.status >= 500
+                )
+            
+            if FETCH_STREAMING:
+                product_info, body = await read_product_info_streaming(url, response)
+                if product_info:
+                    fetch_cache.store(url, response.headers, None, product_info)
+                    return product_info
+                # Маркеры не найдены: страница уже прочитана целиком, разбираем ее полностью
+                async with parser_pool.slot():
+                    return await extract_page(url, response, body)
+            
+            # Слот пула занимается до чтения тела, чтобы не копить страницы в памяти
+            async with parser_pool.slot():
+                body = await response.read()
+                http_client.record(len(body))
+                return await extract_page(url, response, body)
+    except aiohttp.ClientError as e:
+        raise FetchError(NETWORK, f"Ошибка сети: {e}") from e
+    except asyncio.TimeoutError as e:
+        raise FetchError(NETWORK, "Таймаут запроса") from e
+
+async def extract_page(url: str, response: aiohttp.ClientResponse, body: bytes) -> Dict:
+    """Разбор страницы целиком в пуле с пропуском неизменившегося тела."""
+    digest = body_hash(body)
+    product_info = fetch_cache.match_body(url, digest)
+    if product_info:
+        fetch_logger.info("fetch url=%s status=200 bytes=%d source=same_body", url, len(body))
+        return product_info
+    with sweep_profiler.span('extract'):
+        product_info = await parser_pool.extract(body, response.charset or 'utf-8')
+    if not product_info:
+        logger.debug("HTML страницы: %r...", body[:500])  # Логируем начало HTML для отладки
+        if is_captcha_page(body):
+            raise FetchError(CAPTCHA, "Вместо страницы товара получена капча")
+        raise FetchError(PARSE, "Не удалось найти название или цену товара на странице")
+    fetch_cache.store(url, response.headers, digest, product_info)
+    fetch_logger.info("fetch url=%s status=200 bytes=%d price=%d", url, len(body), product_info['price'])
+    return product_info
+
+async def read_product_info_streaming(url: str, response: aiohttp.ClientResponse) -> Tuple[Optional[Dict], bytes]:
+    """Чтение страницы частями до появления названия и цены товара.
+
+    Как только оба элемента найдены, соединение закрывается без
+    дочитывания оставшейся части страницы. Если маркеры так и не
+    встретились, вместо результата возвращается вся прочитанная страница
+    для полного разбора.
+    """
+    incremental = IncrementalExtractor(response.charset or 'utf-8')
+    parse_time = 0.0
+    try:
+        async for chunk in response.content.iter_chunked(FETCH_CHUNK_SIZE):
+            started = time.perf_counter()
+            found = incremental.feed(chunk)
+            parse_time += time.perf_counter() - started
+            if found:
+                break
+    finally:
+        http_client.record(incremental.bytes_fed)
+        PARSE_SECONDS.observe(parse_time)
+        sweep_profiler.record('extract', parse_time)
+        if not response.content.at_eof():
+            response.close()
+    
+    product_info = incremental.result()
+    if not product_info:
+        return None, incremental.body()
+    fetch_logger.info(
+        "fetch url=%s status=200 bytes=%d price=%d streamed=1", url, incremental.bytes_fed, product_info['price']
+    )
+    return product_info, b''
+
+async def get_main_keyboard(user_id: int) -> ReplyKeyboardMarkup:
     """Создание основной клавиатуры."""
-    products = db.get_user_products(user_id)
+    products = await db.get_user_products(user_id)
     keyboard = []
     
     if products:
@@ -223,6 +319,11 @@ def get_threshold_keyboard(product_id: int = None) -> InlineKeyboardMarkup:
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
+def get_check_progress_keyboard() -> InlineKeyboardMarkup:
+    """Создание клавиатуры для сообщения о ходе проверки."""
+    keyboard = [[InlineKeyboardButton(text="⛔️ Остановить проверку", callback_data="cancel_check")]]
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
 def get_settings_keyboard() -> InlineKeyboardMarkup:
     """Создание клавиатуры для настроек."""
     keyboard = [
@@ -235,52 +336,32 @@ def get_settings_keyboard() -> InlineKeyboardMarkup:
             InlineKeyboardButton(text="⏱ 30 минут", callback_data="interval_30")
         ],
         [InlineKeyboardButton(text="🔄 Проверить сейчас", callback_data="check_now")],
+        [InlineKeyboardButton(
+            text=f"🔬 Профилирование: {'вкл' if sweep_profiler.enabled else 'выкл'}",
+            callback_data="toggle_profiling"
+        )],
         [InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_main")]
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 async def generate_price_graph(product_id: int, hours: int) -> Optional[bytes]:
     """Генерация графика изменения цен."""
-    try:
-        history = db.get_price_history(product_id, hours)
-        if not history:
+    async def load_graph_data():
+        timestamps, prices = await db.get_price_history_arrays(product_id, hours)
+        if not len(timestamps):
             return None
-
-        prices = [price for price, _ in history]
-        timestamps = [datetime.strptime(ts, '%Y-%m-%d %H:%M:%S') for _, ts in history]
-
         # Получаем информацию о товаре для заголовка
-        product = db.get_product(product_id)
-        product_name = product[2] if product else "Товар"
-
-        plt.figure(figsize=(10, 6))
-        plt.plot(timestamps, prices, marker='o')
-        plt.title(f'Изменение цены: {product_name}')
-        plt.xlabel('Время')
-        plt.ylabel('Цена (₽)')
-        plt.grid(True)
-        plt.xticks(rotation=45)
-        
-        # Устанавливаем разумные пределы по времени
-        if len(timestamps) > 1:
-            time_range = max(timestamps) - min(timestamps)
-            plt.xlim(min(timestamps) - time_range * 0.1, max(timestamps) + time_range * 0.1)
-        else:
-            # Если только одна точка, показываем период в 1 час
-            single_time = timestamps[0]
-            plt.xlim(single_time - timedelta(hours=0.5), single_time + timedelta(hours=0.5))
-        
-        # Форматируем метки времени
-        plt.gca().xaxis.set_major_formatter(plt.matplotlib.dates.DateFormatter('%d.%m %H:%M'))
-        
-        # Устанавливаем интервал между метками времени
-        plt.gca().xaxis.set_major_locator(plt.matplotlib.dates.AutoDateLocator())
-        
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', bbox_inches='tight')
-        plt.close()
-        buf.seek(0)
-        return buf.getvalue()
+        product = await db.get_product(product_id)
+        product_name = product.name if product else "Товар"
+        return timestamps, prices, product_name
+
+    try:
+        # Отложенные цены товара записываем в историю, чтобы они попали на график
+        if db.has_pending_price(product_id):
+            await db.flush_price_updates()
+        # Новый график строится только при появлении новых записей истории
+        last_history_id = await db.get_last_history_id(product_id)
+        return await graph_renderer.get_or_render((product_id, hours, last_history_id), load_graph_data)
     except Exception as e:
         logger.error(f"Ошибка при генерации графика: {e}")
         return None
@@ -301,7 +382,7 @@ async def cmd_start(message: types.Message):
     # Отправляем приветственное сообщение
     welcome_message = await message.answer(
         welcome_text, 
-        reply_markup=get_main_keyboard(message.from_user.id)
+        reply_markup=await get_main_keyboard(message.from_user.id)
     )
     
     # Пытаемся закрепить сообщение
@@ -318,19 +399,19 @@ async def cmd_start(message: types.Message):
 @dp.message(lambda message: message.text == "📋 Мои товары")
 async def show_products(message: types.Message):
     """Показать список товаров пользователя."""
-    products = db.get_user_products(message.from_user.id)
+    products = await db.get_user_products(message.from_user.id)
     if not products:
         await message.reply("У вас пока нет отслеживаемых товаров.")
         return
 
     text = "📋 Ваши товары:\n\n"
     keyboard = []
-    for product_id, _, name, price, threshold in products:
-        text += f"📦 {name}\n💰 Цена: {price}₽\n⚡️ Порог: {threshold}₽\n\n"
+    for product in products:
+        text += f"📦 {product.name}\n💰 Цена: {product.last_price}₽\n⚡️ Порог: {product.threshold}₽\n\n"
         keyboard.append([
             InlineKeyboardButton(
-                text=f"📦 {name} | {price}₽ | ⚡️ {threshold}₽",
-                callback_data=f"select_product_{product_id}"
+                text=f"📦 {product.name} | {product.last_price}₽ | ⚡️ {product.threshold}₽",
+                callback_data=f"select_product_{product.id}"
             )
         ])
     
@@ -345,7 +426,7 @@ async def start_add_product(message: types.Message, state: FSMContext):
 @dp.message(lambda message: message.text == "📊 Графики цен")
 async def show_graphs_menu(message: types.Message):
     """Показать меню графиков."""
-    products = db.get_user_products(message.from_user.id)
+    products = await db.get_user_products(message.from_user.id)
     if not products:
         await message.reply(
             "У вас пока нет отслеживаемых товаров.\n"
@@ -355,11 +436,11 @@ async def show_graphs_menu(message: types.Message):
 
     text = "Выберите товар для просмотра графика:"
     keyboard = []
-    for product_id, _, name, _, _ in products:
+    for product in products:
         keyboard.append([
             InlineKeyboardButton(
-                text=f"📊 {name}",
-                callback_data=f"select_graph_{product_id}"
+                text=f"📊 {product.name}",
+                callback_data=f"select_graph_{product.id}"
             )
         ])
     
@@ -372,8 +453,8 @@ async def show_settings(message: types.Message):
         await message.reply("❌ У вас нет доступа к настройкам.")
         return
         
-    products_count = len(db.get_user_products(message.from_user.id))
-    current_interval = db.get_check_interval()
+    products_count = len(await db.get_user_products(message.from_user.id))
+    current_interval = await db.get_check_interval()
     text = (
         "⚙️ Настройки бота:\n\n"
         f"• Отслеживаемых товаров: {products_count}\n"
@@ -392,7 +473,8 @@ async def process_url(message: types.Message, state: FSMContext):
         await message.reply("❌ Пожалуйста, отправьте действительный URL товара.")
         return
 
-    product_info = await get_product_info(url)
+    # Страница, загруженная несколько секунд назад, повторно не запрашивается
+    product_info = await get_product_info(url, max_age=FETCH_CACHE_TTL, retry=False)
     if not product_info:
         await message.reply("❌ Не удалось получить информацию о товаре. Проверьте ссылку.")
         return
@@ -418,13 +500,13 @@ async def process_threshold(message: types.Message, state: FSMContext):
         return
 
     data = await state.get_data()
-    if db.add_product(message.from_user.id, data["url"], data["name"], data["price"]):
+    if await db.add_product(message.from_user.id, data["url"], data["name"], data["price"]):
         await message.reply(
             f"✅ Товар добавлен!\n"
             f"📦 {data['name']}\n"
             f"💰 Цена: {data['price']}₽\n"
             f"⚡️ Порог: {threshold}₽",
-            reply_markup=get_main_keyboard(message.from_user.id)
+            reply_markup=await get_main_keyboard(message.from_user.id)
         )
     else:
         await message.reply("❌ Произошла ошибка при добавлении товара.")
@@ -456,7 +538,7 @@ async def process_graph_callback(callback_query: types.CallbackQuery):
 async def process_delete_callback(callback_query: types.CallbackQuery):
     """Обработка запроса на удаление товара."""
     product_id = int(callback_query.data.split("_")[1])
-    if db.delete_product(product_id, callback_query.from_user.id):
+    if await db.delete_product(product_id, callback_query.from_user.id):
         await callback_query.message.edit_text("✅ Товар удален.")
     else:
         await callback_query.message.reply("❌ Не удалось удалить товар.")
@@ -465,13 +547,12 @@ async def process_delete_callback(callback_query: types.CallbackQuery):
 async def process_threshold_update(callback_query: types.CallbackQuery):
     """Обработка запроса на изменение порога."""
     product_id = int(callback_query.data.split("_")[2])
-    product = db.get_product(product_id)
+    product = await db.get_product(product_id)
     if product:
-        _, _, name, price, threshold = product
         await callback_query.message.edit_text(
-            f"📦 {name}\n"
-            f"💰 Текущая цена: {price}₽\n"
-            f"⚡️ Текущий порог: {threshold}₽\n\n"
+            f"📦 {product.name}\n"
+            f"💰 Текущая цена: {product.last_price}₽\n"
+            f"⚡️ Текущий порог: {product.threshold}₽\n\n"
             "Выберите новый порог:",
             reply_markup=get_threshold_keyboard(product_id)
         )
@@ -489,7 +570,7 @@ async def process_threshold_selection(callback_query: types.CallbackQuery, state
         # Проверяем, есть ли уже данные о товаре
         if "url" in data:
             # Добавляем новый товар
-            if db.add_product(callback_query.from_user.id, data["url"], data["name"], data["price"], threshold):
+            if await db.add_product(callback_query.from_user.id, data["url"], data["name"], data["price"], threshold):
                 await callback_query.message.edit_text(
                     f"✅ Товар добавлен!\n"
                     f"📦 {data['name']}\n"
@@ -498,21 +579,20 @@ async def process_threshold_selection(callback_query: types.CallbackQuery, state
                 )
                 await callback_query.message.answer(
                     "Используйте кнопки ниже для навигации:",
-                    reply_markup=get_main_keyboard(callback_query.from_user.id)
+                    reply_markup=await get_main_keyboard(callback_query.from_user.id)
                 )
             else:
                 await callback_query.message.edit_text("❌ Произошла ошибка при добавлении товара.")
         elif len(parts) > 2:
             # Обновляем порог для существующего товара
             product_id = int(parts[2])
-            if db.set_threshold(product_id, callback_query.from_user.id, threshold):
-                product = db.get_product(product_id)
+            if await db.set_threshold(product_id, callback_query.from_user.id, threshold):
+                product = await db.get_product(product_id)
                 if product:
-                    _, _, name, price, _ = product
                     await callback_query.message.edit_text(
                         f"✅ Порог успешно обновлен!\n"
-                        f"📦 {name}\n"
-                        f"💰 Цена: {price}₽\n"
+                        f"📦 {product.name}\n"
+                        f"💰 Цена: {product.last_price}₽\n"
                         f"⚡️ Новый порог: {threshold}₽",
                         reply_markup=get_product_keyboard(product_id)
                     )
@@ -542,10 +622,9 @@ async def process_graph_selection(callback_query: types.CallbackQuery):
 async def process_product_selection(callback_query: types.CallbackQuery):
     """Обработка выбора товара."""
     product_id = int(callback_query.data.split("_")[2])
-    product = db.get_product(product_id)
+    product = await db.get_product(product_id)
     if product:
-        _, _, name, price, threshold = product
-        text = f"📦 {name}\n💰 Цена: {price}₽\n⚡️ Порог: {threshold}₽"
+        text = f"📦 {product.name}\n💰 Цена: {product.last_price}₽\n⚡️ Порог: {product.threshold}₽"
         await callback_query.message.edit_text(text, reply_markup=get_product_keyboard(product_id))
     else:
         await callback_query.message.edit_text("❌ Товар не найден.")
@@ -553,18 +632,18 @@ async def process_product_selection(callback_query: types.CallbackQuery):
 @dp.callback_query(lambda c: c.data == "back_to_list")
 async def process_back_to_list(callback_query: types.CallbackQuery):
     """Обработка возврата к списку товаров."""
-    products = db.get_user_products(callback_query.from_user.id)
+    products = await db.get_user_products(callback_query.from_user.id)
     if not products:
         await callback_query.message.edit_text("У вас пока нет отслеживаемых товаров.")
         return
 
     text = "Выберите товар для управления:"
     keyboard = []
-    for product_id, _, name, price, threshold in products:
+    for product in products:
         keyboard.append([
             InlineKeyboardButton(
-                text=f"📦 {name} | {price}₽ | ⚡️ {threshold}₽",
-                callback_data=f"select_product_{product_id}"
+                text=f"📦 {product.name} | {product.last_price}₽ | ⚡️ {product.threshold}₽",
+                callback_data=f"select_product_{product.id}"
             )
         ])
     
@@ -573,7 +652,7 @@ async def process_back_to_list(callback_query: types.CallbackQuery):
 @dp.callback_query(lambda c: c.data == "back_to_graphs")
 async def process_back_to_graphs(callback_query: types.CallbackQuery):
     """Обработка возврата к списку товаров для графиков."""
-    products = db.get_user_products(callback_query.from_user.id)
+    products = await db.get_user_products(callback_query.from_user.id)
     if not products:
         await callback_query.message.edit_text(
             "У вас пока нет отслеживаемых товаров.\n"
@@ -583,11 +662,11 @@ async def process_back_to_graphs(callback_query: types.CallbackQuery):
 
     text = "Выберите товар для просмотра графика:"
     keyboard = []
-    for product_id, _, name, _, _ in products:
+    for product in products:
         keyboard.append([
             InlineKeyboardButton(
-                text=f"📊 {name}",
-                callback_data=f"select_graph_{product_id}"
+                text=f"📊 {product.name}",
+                callback_data=f"select_graph_{product.id}"
             )
         ])
     
@@ -611,11 +690,14 @@ async def process_interval_selection(callback_query: types.CallbackQuery):
         if interval not in [5, 10, 15, 30]:
             raise ValueError("Недопустимый интервал")
             
-        if db.set_check_interval(interval):
+        if await db.set_check_interval(interval):
+            # Новый интервал применяется сразу, без перезапуска
+            check_scheduler.set_interval(interval)
+            products_count = len(await db.get_user_products(callback_query.from_user.id))
             await callback_query.message.edit_text(
                 f"✅ Интервал проверки цен успешно изменен на {interval} минут.\n\n"
                 "⚙️ Настройки бота:\n"
-                f"• Отслеживаемых товаров: {len(db.get_user_products(callback_query.from_user.id))}\n"
+                f"• Отслеживаемых товаров: {products_count}\n"
                 f"• Интервал проверки цен: каждые {interval} минут\n"
                 f"• Последняя проверка: {datetime.now().strftime('%H:%M:%S')}\n"
                 f"• Статус: активен\n\n"
@@ -634,7 +716,7 @@ async def process_back_to_main(callback_query: types.CallbackQuery):
     """Обработка возврата в главное меню."""
     await callback_query.message.edit_text(
         "Выберите действие:",
-        reply_markup=get_main_keyboard(callback_query.from_user.id)
+        reply_markup=await get_main_keyboard(callback_query.from_user.id)
     )
 
 @dp.message(Command("help"))
@@ -663,7 +745,7 @@ async def cmd_help(message: types.Message):
         "• При достижении порога изменения цены вы получите уведомление\n"
         "• Все изменения цен сохраняются в истории"
     )
-    await message.answer(help_text, reply_markup=get_main_keyboard(message.from_user.id))
+    await message.answer(help_text, reply_markup=await get_main_keyboard(message.from_user.id))
 
 # async def check_prices():
 #     """Проверка цен всех товаров."""
@@ -706,43 +788,94 @@ async def cmd_help(message: types.Message):
 #     except Exception as e:
 #         logger.error(f"Ошибка при проверке цен: {e}")
 
-async def check_prices():
-    """Проверка цен всех товаров."""
+async def check_prices(stats: Optional[SweepStats] = None) -> Optional[SweepStats]:
+    """Проверка цен всех товаров.
+
+    Если передан stats, прогресс проверки отражается в нем по ходу обхода.
+    """
     logger.info("=== Начало проверки цен ===")
     try:
-        products = db.get_all_products()
-        logger.info(f"Найдено товаров для проверки: {len(products)}")
+        # Профилирование выполняется, только если включено в настройках
+        async with sweep_profiler.profile_sweep():
+            bytes_before = http_client.bytes_read
+            products = await db.get_all_products()
+            # Одна страница загружается один раз для всех подписчиков
+            groups = group_by_url(products, lambda product: product.url)
+            logger.info(f"Найдено товаров для проверки: {len(products)}, уникальных страниц: {len(groups)}")
         
-        for product_id, user_id, url, last_price, threshold in products:
-            logger.info(f"Подготовка проверки товара {product_id} для пользователя {user_id}")
-            await check_single_product(product_id, user_id, url, last_price, threshold)
+            # Уведомления за проход объединяются в одну сводку на пользователя
+            with notifier.batch():
+                stats = await sweep_engine.run(
+                    groups.values(),
+                    check_product_group,
+                    url_of=lambda group: group[0].url,
+                    stats=stats
+                )
+            stats.subscriptions = len(products)
+            SWEEP_SECONDS.observe(stats.duration)
+            # Записываем накопленные за проход цены, не дожидаясь таймера
+            with sweep_profiler.span('persist'):
+                await db.flush_price_updates()
         
-        logger.info("=== Проверка цен завершена ===")
+            logger.info(
+                f"=== Проверка цен завершена: {stats}, "
+                f"загружено {(http_client.bytes_read - bytes_before) / 1024:.0f} КБ, {fetch_cache}, {fetcher}, {db.catalog} ==="
+            )
+            check_interval = await db.get_check_interval()
+            if stats.duration > check_interval * 60:
+                logger.warning(
+                    f"Проверка цен заняла {stats.duration:.1f} с, что больше интервала "
+                    f"проверки ({check_interval} мин). Увеличьте CHECK_CONCURRENCY или интервал."
+                )
+            return stats
     except Exception as e:
         logger.error(f"Ошибка при проверке цен: {e}")
+        return None
 
-async def check_single_product(product_id: int, user_id: int, url: str, last_price: int, threshold: int):
-    """Проверка цены одного товара."""
-    try:
-        product_info = await get_product_info(url)
+async def check_product_group(products: List[Product]) -> Optional[Dict]:
+    """Проверка цены одной страницы для всех подписанных пользователей."""
+    url = products[0].url
+    with sweep_profiler.span('product', key=url):
+        product_info = await get_product_info(url, limit=sweep_engine.limit)
         if not product_info:
-            logger.error(f"Не удалось получить информацию о товаре {product_id}")
-            return
-            
-        current_price = product_info["price"]
-        price_diff = current_price - last_price
-        abs_price_diff = abs(price_diff)
+            CHECKS_TOTAL.inc(result='failed')
+            logger.error(f"Не удалось получить информацию о товаре {url} ({len(products)} подписок)")
+            return None
+        
+        CHECKS_TOTAL.inc(result='ok')
+        for product in products:
+            await apply_product_info(product.id, product.user_id, product.last_price, product.threshold, product_info)
+        return product_info
+
+async def load_product_groups() -> Dict[str, List[Product]]:
+    """Актуальные подписки, сгруппированные по странице товара."""
+    # Сначала записываем отложенные цены, чтобы не сравнивать с устаревшими
+    await db.flush_price_updates()
+    products = await db.get_all_products()
+    return group_by_url(products, lambda product: product.url)
+
+async def apply_product_info(product_id: int, user_id: int, last_price: int, threshold: int, product_info: Dict) -> bool:
+    """Сравнение полученной цены с сохраненной, уведомление и обновление цены."""
+    try:
+        with sweep_profiler.span('compare'):
+            current_price = product_info["price"]
+            price_diff = current_price - last_price
+            abs_price_diff = abs(price_diff)
+            if abs_price_diff >= threshold:
+                status = 'notified_up' if price_diff > 0 else 'notified_down'
+            elif price_diff != 0:
+                status = 'changed'
+            else:
+                status = 'unchanged'
         
-        logger.info(f"Проверка товара {product_id}:")
-        logger.info(f"  • Название: {product_info['name']}")
-        logger.info(f"  • Последняя цена: {last_price}₽")
-        logger.info(f"  • Текущая цена: {current_price}₽")
-        logger.info(f"  • Разница: {price_diff}₽")
-        logger.info(f"  • Модуль разницы: {abs_price_diff}₽")
-        logger.info(f"  • Порог: {threshold}₽")
+        with sweep_profiler.span('persist'):
+            db.queue_checked(product_id)
+            # Новая цена сохраняется и при изменении меньше порога
+            if status != 'unchanged':
+                db.queue_price_update(product_id, current_price)
         
         if abs_price_diff >= threshold:
-            try:
+            with sweep_profiler.span('notify'):
                 if price_diff > 0:
                     message = (
                         f"📈 Цена выросла!\n"
@@ -750,7 +883,6 @@ async def check_single_product(product_id: int, user_id: int, url: str, last_pri
                         f"Была: {last_price}₽, стала: {current_price}₽\n"
                         f"Разница: +{price_diff}₽"
                     )
-                    logger.info(f"  • Статус: Цена выросла на {price_diff}₽ (превышен порог {threshold}₽)")
                 else:
                     message = (
                         f"📉 Цена упала!\n"
@@ -758,27 +890,18 @@ async def check_single_product(product_id: int, user_id: int, url: str, last_pri
                         f"Была: {last_price}₽, стала: {current_price}₽\n"
                         f"Разница: {price_diff}₽"
                     )
-                    logger.info(f"  • Статус: Цена упала на {abs_price_diff}₽ (превышен порог {threshold}₽)")
-                
-                logger.info(f"  • Отправка уведомления пользователю {user_id}")
-                await bot.send_message(user_id, message)
-                aiogram_logger.info(f"  • Уведомление отправлено пользователю {user_id}")
-                
-                if db.update_price(product_id, current_price):
-                    db_logger.info(f"  • Цена успешно обновлена в базе данных")
-                else:
-                    db_logger.error(f"  • Ошибка обновления цены в базе данных")
-            except TelegramAPIError as e:
-                aiogram_logger.error(f"  • Ошибка отправки уведомления: {e}")
-        else:
-            # Если цена изменилась, но не достигла порога, просто обновляем её
-            if price_diff != 0:
-                db.update_price(product_id, current_price)
-                logger.info(f"  • Статус: Цена изменилась на {price_diff}₽ (не достигнут порог {threshold}₽)")
-            else:
-                logger.info(f"  • Статус: Цена не изменилась")
+                # Уведомление уходит через очередь и не задерживает проверку
+                notifier.send(user_id, message)
+        
+        # Одна строка на проверку, форматируется в потоке журналирования
+        check_logger.info(
+            "check product=%d user=%d last=%d price=%d diff=%+d threshold=%d status=%s",
+            product_id, user_id, last_price, current_price, price_diff, threshold, status
+        )
+        return True
     except Exception as e:
         logger.error(f"Ошибка при проверке товара {product_id}: {e}")
+        return False
 
 @dp.callback_query(lambda c: c.data == "check_now")
 async def process_check_now(callback_query: types.CallbackQuery):
@@ -787,15 +910,98 @@ async def process_check_now(callback_query: types.CallbackQuery):
         await callback_query.answer("❌ У вас нет доступа к настройкам.", show_alert=True)
         return
     
-    await callback_query.message.edit_text("🔄 Запускаю проверку цен...")
-    await check_prices()
+    # Проверка идет в фоне, обработчик сразу отвечает на запрос
+    stats = SweepStats(0)
+    sweep_task = check_scheduler.start_background_sweep(stats)
+    if sweep_task is None:
+        await callback_query.answer("⏳ Проверка цен уже выполняется", show_alert=True)
+        return
+    await callback_query.answer("🔄 Проверка запущена")
+    await callback_query.message.edit_text(
+        format_check_progress(stats),
+        reply_markup=get_check_progress_keyboard()
+    )
+    task = asyncio.create_task(
+        report_check_progress(callback_query.message, callback_query.from_user.id, sweep_task, stats)
+    )
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+@dp.callback_query(lambda c: c.data == "cancel_check")
+async def process_cancel_check(callback_query: types.CallbackQuery):
+    """Обработка остановки ручной проверки цен."""
+    if callback_query.from_user.id not in ADMIN_IDS:
+        await callback_query.answer("❌ У вас нет доступа к настройкам.", show_alert=True)
+        return
+    
+    if check_scheduler.cancel_sweep():
+        await callback_query.answer("⛔️ Проверка остановлена")
+    else:
+        await callback_query.answer("Проверка уже завершена")
+
+@dp.callback_query(lambda c: c.data == "toggle_profiling")
+async def process_toggle_profiling(callback_query: types.CallbackQuery):
+    """Включение и выключение профилирования полных проверок цен."""
+    if callback_query.from_user.id not in ADMIN_IDS:
+        await callback_query.answer("❌ У вас нет доступа к настройкам.", show_alert=True)
+        return
+    
+    sweep_profiler.enabled = not sweep_profiler.enabled
+    logger.info(f"Профилирование проверок {'включено' if sweep_profiler.enabled else 'выключено'} "
+                f"пользователем {callback_query.from_user.id}")
+    try:
+        await callback_query.message.edit_reply_markup(reply_markup=get_settings_keyboard())
+    except TelegramBadRequest as e:
+        logger.warning(f"Не удалось обновить клавиатуру настроек: {e}")
+    if sweep_profiler.enabled:
+        await callback_query.answer(
+            f"🔬 Профилирование включено. Отчет о следующей полной проверке "
+            f"{'' if CHECK_MODE == 'sweep' else '(кнопка «Проверить сейчас») '}"
+            f"будет записан в журнал и в {sweep_profiler.output_dir}/",
+            show_alert=True
+        )
+    else:
+        await callback_query.answer("🔬 Профилирование выключено")
+
+def format_check_progress(stats: SweepStats) -> str:
+    """Текст сообщения о ходе проверки."""
+    elapsed = time.monotonic() - stats.started_at
+    if not stats.total:
+        return f"🔄 Запускаю проверку цен...\n⏱ Прошло: {elapsed:.0f} с"
+    return (
+        "🔄 Идет проверка цен...\n\n"
+        f"• Проверено: {stats.checked}/{stats.total}\n"
+        f"• Ошибок: {stats.failed}\n"
+        f"• Прошло: {elapsed:.0f} с"
+    )
+
+async def report_check_progress(message: types.Message, user_id: int, sweep_task: asyncio.Task, stats: SweepStats):
+    """Обновление сообщения о ходе проверки до ее завершения."""
+    last_text = format_check_progress(stats)
+    while not sweep_task.done():
+        await asyncio.wait({sweep_task}, timeout=PROGRESS_UPDATE_INTERVAL)
+        text = format_check_progress(stats)
+        if sweep_task.done() or text == last_text:
+            continue
+        try:
+            await message.edit_text(text, reply_markup=get_check_progress_keyboard())
+            last_text = text
+        except TelegramBadRequest as e:
+            logger.warning(f"Не удалось обновить ход проверки: {e}")
+    
+    if sweep_task.cancelled():
+        status = f"⛔️ Проверка цен остановлена: проверено {stats.checked}/{stats.total}"
+    elif not sweep_task.result():
+        status = "⏳ Проверка цен уже выполнялась по расписанию"
+    else:
+        status = f"✅ Проверка цен завершена!\nПроверено: {stats.checked}/{stats.total}, ошибок: {stats.failed}"
     
     # Показываем настройки
-    products = db.get_user_products(callback_query.from_user.id)
+    products = await db.get_user_products(user_id)
     products_count = len(products)
-    current_interval = db.get_check_interval()
+    current_interval = await db.get_check_interval()
     text = (
-        "✅ Проверка цен завершена!\n\n"
+        f"{status}\n\n"
         "⚙️ Настройки бота:\n"
         f"• Отслеживаемых товаров: {products_count}\n"
         f"• Интервал проверки цен: каждые {current_interval} минут\n"
@@ -803,27 +1009,71 @@ async def process_check_now(callback_query: types.CallbackQuery):
         f"• Статус: активен\n\n"
         "Выберите действие:"
     )
-    await callback_query.message.answer(text, reply_markup=get_settings_keyboard())
-    await callback_query.answer("✅ Проверка завершена")
+    try:
+        await message.edit_text(text, reply_markup=get_settings_keyboard())
+    except TelegramBadRequest as e:
+        logger.warning(f"Не удалось показать итог проверки: {e}")
+
+def register_gauges():
+    """Метрики текущего состояния очередей и кэшей."""
+    metrics_registry.gauge(
+        'price_bot_queue_depth', 'Глубина внутренних очередей',
+        lambda: {
+            ('notifications',): notifier.queue_depth,
+            ('parser',): parser_pool.pending,
+            ('db_writes',): db.pending_writes,
+        },
+        labels=('queue',)
+    )
+    metrics_registry.gauge(
+        'price_bot_sweep_running', 'Идет ли сейчас полная проверка цен',
+        lambda: int(check_scheduler.sweep_running)
+    )
+    metrics_registry.gauge('price_bot_products', 'Число отслеживаемых товаров', lambda: len(db.catalog))
+    metrics_registry.gauge('price_bot_fetch_cache_hit_ratio', 'Доля попаданий в кэш загрузок', lambda: fetch_cache.hit_rate)
+    metrics_registry.gauge('price_bot_circuit_breaker_trips', 'Число приостановок запросов', lambda: fetcher.breaker.trips)
 
 async def main():
     """Основная функция запуска бота."""
     try:
-        # Проверка цен при перезапуске
-        await check_prices()  # Добавлено для проверки цен сразу после запуска
+        # Общий HTTP-клиент для всех запросов к Яндекс.Маркету
+        await http_client.start()
+        # Фоновая пакетная запись цен
+        await db.start()
+        # Очередь уведомлений
+        await notifier.start()
+        # Метрики для Prometheus
+        if METRICS_PORT:
+            register_gauges()
+            await metrics_server.start()
         
-        scheduler = AsyncIOScheduler()
         # Получаем интервал из базы данных
-        check_interval = db.get_check_interval()
-        scheduler.add_job(check_prices, "interval", minutes=check_interval)
-        scheduler.start()
+        check_interval = await db.get_check_interval()
+        check_scheduler.start(check_interval, check_prices, load_product_groups, check_product_group)
+        if CHECK_MODE == 'sweep':
+            # Проверка цен при перезапуске идет в фоне, бот сразу отвечает пользователям.
+            # Первыми проверяются товары, которые дольше всего не проверялись.
+            # В равномерных режимах давно не проверенные страницы и так стоят
+            # первыми в расписании, отдельный полный проход не нужен
+            check_scheduler.start_background_sweep()
+        # Периодическое сжатие истории цен
+        check_scheduler.add_periodic(db.compact_price_history, HISTORY_COMPACT_INTERVAL, 'compact_price_history')
         
         await bot.delete_webhook(drop_pending_updates=True)
         await dp.start_polling(bot)
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}")
     finally:
-        db.close()
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await check_scheduler.shutdown()
+        await metrics_server.stop()
+        await notifier.close()
+        await http_client.close()
+        parser_pool.shutdown()
+        graph_renderer.shutdown()
+        await db.close()
 
 if __name__ == "__main__":
     try:
@@ -831,4 +1081,7 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         logger.info("Бот остановлен пользователем")
     except Exception as e:
-        logger.error(f"Критическая ошибка: {e}")
\ No newline at end of file
+        logger.error(f"Критическая ошибка: {e}")
+    finally:
+        # Дописываем оставшиеся в очереди записи журнала
+        log_listener.stop()
@@ -0,0 +1,112 @@
+import sys
+from typing import Dict, Iterable, List, Optional
+
+from models import Product
+
+
+class ProductCatalog:
+    """Все отслеживаемые товары в памяти с индексами по id и пользователю.
+
+    Каталог загружается из базы один раз при запуске и дальше обновляется
+    вместе с каждой записью в базу, поэтому чтение товаров не обращается
+    к диску. Возвращаются сами записи каталога без копирования: их нельзя
+    изменять в обход методов каталога.
+    """
+
+    def __init__(self):
+        self._by_id: Dict[int, Product] = {}
+        self._by_user: Dict[int, Dict[int, Product]] = {}
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def load(self, products: Iterable[Product]) -> None:
+        """Заполнение каталога товарами из базы."""
+        self._by_id.clear()
+        self._by_user.clear()
+        for product in sorted(products, key=lambda product: product.id):
+            self.add(product)
+        self.loaded = True
+
+    def add(self, product: Product) -> None:
+        self._by_id[product.id] = product
+        self._by_user.setdefault(product.user_id, {})[product.id] = product
+
+    def remove(self, product_id: int, user_id: int) -> None:
+        product = self._by_id.get(product_id)
+        if product is None or product.user_id != user_id:
+            return
+        del self._by_id[product_id]
+        user_products = self._by_user[user_id]
+        del user_products[product_id]
+        if not user_products:
+            del self._by_user[user_id]
+
+    def set_threshold(self, product_id: int, user_id: int, threshold: int) -> None:
+        product = self._by_id.get(product_id)
+        if product is not None and product.user_id == user_id:
+            product.threshold = threshold
+
+    def set_price(self, product_id: int, price: int) -> None:
+        product = self._by_id.get(product_id)
+        if product is not None:
+            product.last_price = price
+
+    def set_checked(self, product_id: int, checked_at: str) -> None:
+        product = self._by_id.get(product_id)
+        if product is not None:
+            product.checked_at = checked_at
+
+    def user_products(self, user_id: int) -> List[Product]:
+        """Товары пользователя в порядке добавления."""
+        user_products = self._by_user.get(user_id)
+        if user_products is None:
+            self.misses += 1
+            return []
+        self.hits += 1
+        return list(user_products.values())
+
+    def product(self, product_id: int) -> Optional[Product]:
+        """Товар по id."""
+        product = self._by_id.get(product_id)
+        if product is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return product
+
+    def all_products(self) -> List[Product]:
+        """Все товары, давно не проверенные первыми."""
+        self.hits += 1
+        return sorted(
+            self._by_id.values(),
+            key=lambda product: (product.checked_at is not None, product.checked_at or '')
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def memory_usage(self) -> int:
+        """Приблизительный объем памяти каталога в байтах."""
+        size = sys.getsizeof(self._by_id) + sys.getsizeof(self._by_user)
+        for user_products in self._by_user.values():
+            size += sys.getsizeof(user_products)
+        for product in self._by_id.values():
+            size += sys.getsizeof(product) + sys.getsizeof(product.url) + sys.getsizeof(product.name)
+            if product.checked_at is not None:
+                size += sys.getsizeof(product.checked_at)
+        return size
+
+    def __str__(self) -> str:
+        # memory_usage() обходит весь каталог, поэтому считается один раз
+        memory = self.memory_usage()
+        per_10k = memory / len(self) * 10000 / 1024 / 1024 if self._by_id else 0.0
+        return (
+            f"каталог: товаров {len(self)}, попаданий {self.hit_rate:.0%}, "
+            f"память {memory / 1024:.0f} КБ (~{per_10k:.1f} МБ на 10 тыс. товаров)"
+        )
@@ -47,3 +47,222 @@ PRICE_THRESHOLD = int(os.getenv("PRICE_THRESHOLD", 500))
 
 # Список ID администраторов
 ADMIN_IDS = [int(id) for id in get_env_var("ADMIN_IDS", "").split(",") if id.isdigit()]
+
+# Параметры параллельной проверки цен. Все товары находятся на одном хосте,
+# поэтому общий лимит сверх лимита на хост действует только при нескольких хостах
+try:
+    CHECK_CONCURRENCY = int(get_env_var("CHECK_CONCURRENCY", "8"))
+    CHECK_PER_HOST_LIMIT = int(get_env_var("CHECK_PER_HOST_LIMIT", "8"))
+    if CHECK_CONCURRENCY < 1 or CHECK_PER_HOST_LIMIT < 1:
+        raise ValueError("лимиты параллельности должны быть положительными числами")
+except ValueError as e:
+    logger.error(f"Некорректное значение лимитов параллельности: {e}")
+    CHECK_CONCURRENCY = 8
+    CHECK_PER_HOST_LIMIT = 8
+
+# Параметры пула HTTP-соединений. Запас сверх CHECK_PER_HOST_LIMIT оставлен
+# для запросов при добавлении товара, которые идут в обход лимитов проверки
+try:
+    HTTP_POOL_LIMIT = int(get_env_var("HTTP_POOL_LIMIT", "100"))
+    HTTP_POOL_LIMIT_PER_HOST = int(get_env_var("HTTP_POOL_LIMIT_PER_HOST", "10"))
+    HTTP_DNS_CACHE_TTL = int(get_env_var("HTTP_DNS_CACHE_TTL", "300"))
+    HTTP_KEEPALIVE_TIMEOUT = float(get_env_var("HTTP_KEEPALIVE_TIMEOUT", "60"))
+    HTTP_TIMEOUT = float(get_env_var("HTTP_TIMEOUT", "30"))
+except ValueError as e:
+    logger.error(f"Некорректное значение параметров HTTP-клиента: {e}")
+    HTTP_POOL_LIMIT = 100
+    HTTP_POOL_LIMIT_PER_HOST = 10
+    HTTP_DNS_CACHE_TTL = 300
+    HTTP_KEEPALIVE_TIMEOUT = 60.0
+    HTTP_TIMEOUT = 30.0
+
+# Способ извлечения данных со страницы товара: fast (поиск маркеров) или soup (полный разбор)
+HTML_EXTRACTOR = get_env_var("HTML_EXTRACTOR", "fast")
+if HTML_EXTRACTOR not in ("fast", "soup"):
+    logger.error(f"Некорректное значение HTML_EXTRACTOR: {HTML_EXTRACTOR}")
+    HTML_EXTRACTOR = "fast"
+
+# Потоковая загрузка страницы с остановкой после нахождения цены.
+# Выключена по умолчанию: ранняя остановка закрывает соединение, и следующий
+# запрос платит за новое рукопожатие (см. benchmarks/bench_streaming.py)
+FETCH_STREAMING = get_env_var("FETCH_STREAMING", "0").lower() in ("1", "true", "yes")
+try:
+    FETCH_CHUNK_SIZE = int(get_env_var("FETCH_CHUNK_SIZE", "65536"))
+except ValueError as e:
+    logger.error(f"Некорректное значение FETCH_CHUNK_SIZE: {e}")
+    FETCH_CHUNK_SIZE = 65536
+
+# Пул для разбора страниц вне цикла событий: thread, process или none.
+# В пуле потоков разбор держит GIL и задерживает обработчики бота
+# (см. benchmarks/bench_parser_pool.py), поэтому по умолчанию process
+PARSER_POOL = get_env_var("PARSER_POOL", "process")
+if PARSER_POOL not in ("thread", "process", "none"):
+    logger.error(f"Некорректное значение PARSER_POOL: {PARSER_POOL}")
+    PARSER_POOL = "process"
+try:
+    PARSER_WORKERS = int(get_env_var("PARSER_WORKERS", "2"))
+    PARSER_QUEUE_DEPTH = int(get_env_var("PARSER_QUEUE_DEPTH", "8"))
+    if PARSER_WORKERS < 1 or PARSER_QUEUE_DEPTH < 1:
+        raise ValueError("параметры пула должны быть положительными числами")
+except ValueError as e:
+    logger.error(f"Некорректное значение параметров пула разбора: {e}")
+    PARSER_WORKERS = 2
+    PARSER_QUEUE_DEPTH = 8
+
+# Число потоков чтения базы данных
+try:
+    DB_READERS = int(get_env_var("DB_READERS", "4"))
+    if DB_READERS < 1:
+        raise ValueError("DB_READERS должен быть положительным числом")
+except ValueError as e:
+    logger.error(f"Некорректное значение DB_READERS: {e}")
+    DB_READERS = 4
+
+# Пакетная запись цен во время проверки
+try:
+    DB_WRITE_BATCH_SIZE = int(get_env_var("DB_WRITE_BATCH_SIZE", "500"))
+    DB_WRITE_FLUSH_INTERVAL = float(get_env_var("DB_WRITE_FLUSH_INTERVAL", "5"))
+    if DB_WRITE_BATCH_SIZE < 1 or DB_WRITE_FLUSH_INTERVAL <= 0:
+        raise ValueError("параметры пакетной записи должны быть положительными")
+except ValueError as e:
+    logger.error(f"Некорректное значение параметров пакетной записи: {e}")
+    DB_WRITE_BATCH_SIZE = 500
+    DB_WRITE_FLUSH_INTERVAL = 5.0
+
+# Хранение истории цен: исходные записи (часов), почасовые агрегаты (дней)
+try:
+    HISTORY_RAW_HOURS = int(get_env_var("HISTORY_RAW_HOURS", "48"))
+    HISTORY_HOURLY_DAYS = int(get_env_var("HISTORY_HOURLY_DAYS", "30"))
+    HISTORY_COMPACT_INTERVAL = int(get_env_var("HISTORY_COMPACT_INTERVAL", "60"))
+    if HISTORY_RAW_HOURS < 24 or HISTORY_HOURLY_DAYS < 2 or HISTORY_COMPACT_INTERVAL < 1:
+        raise ValueError("исходные записи хранятся не меньше 24 часов, агрегаты - не меньше 2 дней")
+except ValueError as e:
+    logger.error(f"Некорректное значение параметров хранения истории: {e}")
+    HISTORY_RAW_HOURS = 48
+    HISTORY_HOURLY_DAYS = 30
+    HISTORY_COMPACT_INTERVAL = 60
+
+# Построение графиков: число потоков и размер кэша готовых изображений
+try:
+    GRAPH_WORKERS = int(get_env_var("GRAPH_WORKERS", "2"))
+    GRAPH_CACHE_SIZE = int(get_env_var("GRAPH_CACHE_SIZE", "128"))
+    GRAPH_CACHE_MAX_BYTES = int(get_env_var("GRAPH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+except ValueError as e:
+    logger.error(f"Некорректное значение параметров построения графиков: {e}")
+    GRAPH_WORKERS = 2
+    GRAPH_CACHE_SIZE = 128
+    GRAPH_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Ограничение частоты уведомлений (сообщений в секунду)
+try:
+    NOTIFY_GLOBAL_RATE = float(get_env_var("NOTIFY_GLOBAL_RATE", "25"))
+    NOTIFY_CHAT_RATE = float(get_env_var("NOTIFY_CHAT_RATE", "1"))
+    NOTIFY_WORKERS = int(get_env_var("NOTIFY_WORKERS", "4"))
+    if NOTIFY_GLOBAL_RATE <= 0 or NOTIFY_CHAT_RATE <= 0 or NOTIFY_WORKERS < 1:
+        raise ValueError("параметры уведомлений должны быть положительными")
+except ValueError as e:
+    logger.error(f"Некорректное значение параметров уведомлений: {e}")
+    NOTIFY_GLOBAL_RATE = 25.0
+    NOTIFY_CHAT_RATE = 1.0
+    NOTIFY_WORKERS = 4
+
+# Режим проверки: sweep (все товары раз в интервал), rolling (равномерный поток проверок)
+# или adaptive (равномерный поток, свой интервал у каждой страницы)
+CHECK_MODE = get_env_var("CHECK_MODE", "sweep")
+if CHECK_MODE not in ("sweep", "rolling", "adaptive"):
+    logger.error(f"Некорректное значение CHECK_MODE: {CHECK_MODE}")
+    CHECK_MODE = "sweep"
+try:
+    ADAPTIVE_MIN_INTERVAL = float(get_env_var("ADAPTIVE_MIN_INTERVAL", "2"))
+    ADAPTIVE_MAX_INTERVAL = float(get_env_var("ADAPTIVE_MAX_INTERVAL", "240"))
+    CHECK_BUDGET_RPM = float(get_env_var("CHECK_BUDGET_RPM", "600"))
+    if ADAPTIVE_MIN_INTERVAL <= 0 or ADAPTIVE_MAX_INTERVAL < ADAPTIVE_MIN_INTERVAL or CHECK_BUDGET_RPM <= 0:
+        raise ValueError("интервалы и бюджет должны быть положительными, минимум не больше максимума")
+except ValueError as e:
+    logger.error(f"Некорректное значение параметров адаптивного планировщика: {e}")
+    ADAPTIVE_MIN_INTERVAL = 2.0
+    ADAPTIVE_MAX_INTERVAL = 240.0
+    CHECK_BUDGET_RPM = 600.0
+
+# Случайный сдвиг срока проверки, доля интервала
+try:
+    CHECK_JITTER = float(get_env_var("CHECK_JITTER", "0.1"))
+    if not 0 <= CHECK_JITTER < 1:
+        raise ValueError("CHECK_JITTER должен быть в диапазоне [0, 1)")
+except ValueError as e:
+    logger.error(f"Некорректное значение CHECK_JITTER: {e}")
+    CHECK_JITTER = 0.1
+
+# Кэш загрузок страниц: размер и срок, в течение которого результат отдается без запроса (секунд)
+try:
+    FETCH_CACHE_SIZE = int(get_env_var("FETCH_CACHE_SIZE", "10000"))
+    FETCH_CACHE_TTL = float(get_env_var("FETCH_CACHE_TTL", "60"))
+    if FETCH_CACHE_SIZE < 0 or FETCH_CACHE_TTL < 0:
+        raise ValueError("Параметры кэша загрузок не могут быть отрицательными")
+except ValueError as e:
+    logger.error(f"Некорректное значение параметров кэша загрузок: {e}")
+    FETCH_CACHE_SIZE = 10000
+    FETCH_CACHE_TTL = 60.0
+
+# Повтор загрузок страниц: число повторов и границы экспоненциальной задержки (секунд)
+try:
+    FETCH_RETRIES = int(get_env_var("FETCH_RETRIES", "2"))
+    FETCH_BACKOFF_BASE = float(get_env_var("FETCH_BACKOFF_BASE", "1"))
+    FETCH_BACKOFF_MAX = float(get_env_var("FETCH_BACKOFF_MAX", "30"))
+    if FETCH_RETRIES < 0 or FETCH_BACKOFF_BASE < 0 or FETCH_BACKOFF_MAX < 0:
+        raise ValueError("Параметры повтора загрузок не могут быть отрицательными")
+except ValueError as e:
+    logger.error(f"Некорректное значение параметров повтора загрузок: {e}")
+    FETCH_RETRIES = 2
+    FETCH_BACKOFF_BASE = 1.0
+    FETCH_BACKOFF_MAX = 30.0
+
+# Приостановка запросов при капче и 429: число ошибок подряд и длительность паузы (секунд)
+try:
+    BREAKER_THRESHOLD = int(get_env_var("BREAKER_THRESHOLD", "5"))
+    BREAKER_RESET_TIMEOUT = float(get_env_var("BREAKER_RESET_TIMEOUT", "60"))
+    BREAKER_MAX_RESET_TIMEOUT = float(get_env_var("BREAKER_MAX_RESET_TIMEOUT", "900"))
+    if BREAKER_THRESHOLD < 1 or BREAKER_RESET_TIMEOUT <= 0 or BREAKER_MAX_RESET_TIMEOUT <= 0:
+        raise ValueError("Параметры приостановки запросов должны быть положительными")
+except ValueError as e:
+    logger.error(f"Некорректное значение параметров приостановки запросов: {e}")
+    BREAKER_THRESHOLD = 5
+    BREAKER_RESET_TIMEOUT = 60.0
+    BREAKER_MAX_RESET_TIMEOUT = 900.0
+
+# Адрес HTTP-сервера метрик в формате Prometheus (порт 0 отключает сервер)
+METRICS_HOST = get_env_var("METRICS_HOST", "127.0.0.1")
+try:
+    METRICS_PORT = int(get_env_var("METRICS_PORT", "9108"))
+    if not 0 <= METRICS_PORT <= 65535:
+        raise ValueError("METRICS_PORT должен быть в диапазоне 0-65535")
+except ValueError as e:
+    logger.error(f"Некорректное значение METRICS_PORT: {e}")
+    METRICS_PORT = 9108
+
+# Журналирование: ротация файлов по размеру и доля сохраняемых INFO-записей подсистем
+try:
+    LOG_MAX_BYTES = int(get_env_var("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(get_env_var("LOG_BACKUP_COUNT", "5"))
+    LOG_SAMPLE_CHECKS = float(get_env_var("LOG_SAMPLE_CHECKS", "1"))
+    LOG_SAMPLE_FETCH = float(get_env_var("LOG_SAMPLE_FETCH", "0.1"))
+    if LOG_MAX_BYTES < 0 or LOG_BACKUP_COUNT < 0:
+        raise ValueError("Параметры ротации журналов не могут быть отрицательными")
+    if not (0 <= LOG_SAMPLE_CHECKS <= 1 and 0 <= LOG_SAMPLE_FETCH <= 1):
+        raise ValueError("Доля записей журнала должна быть в диапазоне [0, 1]")
+except ValueError as e:
+    logger.error(f"Некорректное значение параметров журналирования: {e}")
+    LOG_MAX_BYTES = 10 * 1024 * 1024
+    LOG_BACKUP_COUNT = 5
+    LOG_SAMPLE_CHECKS = 1.0
+    LOG_SAMPLE_FETCH = 0.1
+
+# Профилирование полных проверок цен (можно включить и из настроек бота)
+SWEEP_PROFILE = get_env_var("SWEEP_PROFILE", "0").lower() in ("1", "true", "yes")
+SWEEP_PROFILE_OUTPUT = [
+    output.strip() for output in get_env_var("SWEEP_PROFILE_OUTPUT", "").split(",") if output.strip()
+]
+if any(output not in ("cprofile", "folded") for output in SWEEP_PROFILE_OUTPUT):
+    logger.error(f"Некорректное значение SWEEP_PROFILE_OUTPUT: {','.join(SWEEP_PROFILE_OUTPUT)}")
+    SWEEP_PROFILE_OUTPUT = []
+SWEEP_PROFILE_DIR = get_env_var("SWEEP_PROFILE_DIR", "profiles")
@@ -1,27 +1,81 @@
 import sqlite3
-from typing import List, Tuple, Optional
-from datetime import datetime, timedelta
+import asyncio
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Optional, TYPE_CHECKING
+from datetime import datetime, timedelta, timezone
 import logging
-from config import CHECK_INTERVAL
+from catalog import ProductCatalog
+from metrics import DB_WRITE_SECONDS
+from models import PricePoint, Product
+from config import CHECK_INTERVAL, HISTORY_RAW_HOURS, HISTORY_HOURLY_DAYS
+
+if TYPE_CHECKING:
+    import numpy as np
 
 # Получаем логгер для базы данных
 logger = logging.getLogger('database')
 
+# Версионированные изменения схемы: (версия, описание, SQL-команды).
+# Применяются по порядку в init_db, текущая версия хранится в PRAGMA user_version.
+MIGRATIONS = [
+    (1, "Индексы для выборок товаров пользователя и истории цен", [
+        "CREATE INDEX IF NOT EXISTS idx_prices_user_id ON prices (user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_price_history_product_ts ON price_history (product_id, timestamp)",
+    ]),
+    (2, "Почасовые и посуточные агрегаты истории цен", [
+        """
+        CREATE TABLE IF NOT EXISTS price_history_hourly (
+            product_id INTEGER NOT NULL,
+            bucket TIMESTAMP NOT NULL,
+            min_price INTEGER NOT NULL,
+            max_price INTEGER NOT NULL,
+            last_price INTEGER NOT NULL,
+            PRIMARY KEY (product_id, bucket)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS price_history_daily (
+            product_id INTEGER NOT NULL,
+            bucket TIMESTAMP NOT NULL,
+            min_price INTEGER NOT NULL,
+            max_price INTEGER NOT NULL,
+            last_price INTEGER NOT NULL,
+            PRIMARY KEY (product_id, bucket)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (3, "Время последней проверки товара", [
+        "ALTER TABLE prices ADD COLUMN checked_at TIMESTAMP",
+        "CREATE INDEX IF NOT EXISTS idx_prices_checked_at ON prices (checked_at)",
+    ]),
+]
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Столбцы таблицы prices в порядке полей Product
+PRODUCT_COLUMNS = "id, user_id, url, name, last_price, threshold, checked_at"
+
 class Database:
-    def __init__(self):
+    def __init__(self, db_path: str = "prices.db", init: bool = True):
         """Инициализация базы данных."""
-        self.db_path = "prices.db"
+        self.db_path = db_path
         self.conn = None
         self.cursor = None
         self.connect()
-        self.init_db()
-        logger.info("База данных инициализирована")
+        if init:
+            self.init_db()
+            logger.info("База данных инициализирована")
 
     def connect(self) -> None:
         """Установка соединения с базой данных."""
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            # Соединение используется одним потоком, но закрывается из основного
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
             self.cursor = self.conn.cursor()
+            # WAL позволяет читать параллельно с записью
+            self.cursor.execute("PRAGMA journal_mode=WAL")
+            self.cursor.execute("PRAGMA synchronous=NORMAL")
             logger.info("Успешное подключение к базе данных")
         except sqlite3.Error as e:
             logger.error(f"Ошибка при подключении к базе данных: {e}")
@@ -60,10 +114,38 @@ class Database:
                 )
             """)
             self.conn.commit()
+            self.migrate()
         except Exception as e:
             logger.error(f"Ошибка при инициализации базы данных: {e}")
             raise
 
+    def get_schema_version(self) -> int:
+        """Текущая версия схемы базы данных."""
+        self.cursor.execute("PRAGMA user_version")
+        return self.cursor.fetchone()[0]
+
+    def migrate(self) -> None:
+        """Применение миграций схемы, которые еще не были выполнены."""
+        current_version = self.get_schema_version()
+        for version, description, statements in MIGRATIONS:
+            if version <= current_version:
+                continue
+            # sqlite3 не открывает транзакцию перед DDL сам, поэтому она открывается
+            # явно: изменения схемы и новая версия применяются или откатываются вместе
+            if self.conn.in_transaction:
+                self.conn.commit()
+            try:
+                self.conn.execute("BEGIN")
+                for statement in statements:
+                    self.conn.execute(statement)
+                self.conn.execute(f"PRAGMA user_version = {int(version)}")
+                self.conn.commit()
+                logger.info(f"Применена миграция {version}: {description}")
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                logger.error(f"Ошибка при применении миграции {version}: {e}")
+                raise
+
     def get_check_interval(self) -> int:
         """Получение интервала проверки цен."""
         try:
@@ -117,8 +199,8 @@ class Database:
             logger.error(f"Ошибка при создании таблиц: {e}")
             raise
 
-    def add_product(self, user_id: int, url: str, name: str, price: int, threshold: int = 500) -> bool:
-        """Добавление нового товара для отслеживания."""
+    def add_product(self, user_id: int, url: str, name: str, price: int, threshold: int = 500) -> Optional[int]:
+        """Добавление нового товара для отслеживания. Возвращает id товара."""
         try:
             self.cursor.execute(
                 "INSERT INTO prices (user_id, url, name, last_price, threshold) VALUES (?, ?, ?, ?, ?)",
@@ -133,16 +215,16 @@ class Database:
             
             self.conn.commit()
             logger.info(f"Добавлен новый товар для пользователя {user_id}")
-            return True
+            return product_id
         except sqlite3.Error as e:
             logger.error(f"Ошибка при добавлении товара: {e}")
-            return False
+            return None
 
-    def get_user_products(self, user_id: int) -> List[Tuple]:
+    def get_user_products(self, user_id: int) -> List[Product]:
         """Получение списка товаров пользователя."""
         try:
-            self.cursor.execute("SELECT id, url, name, last_price, threshold FROM prices WHERE user_id = ?", (user_id,))
-            return self.cursor.fetchall()
+            self.cursor.execute(f"SELECT {PRODUCT_COLUMNS} FROM prices WHERE user_id = ?", (user_id,))
+            return [Product(*row) for row in self.cursor.fetchall()]
         except sqlite3.Error as e:
             logger.error(f"Ошибка при получении списка товаров: {e}")
             return []
@@ -165,10 +247,10 @@ class Database:
         """Проверка наличия истории цен для товара."""
         try:
             self.cursor.execute(
-                "SELECT COUNT(*) FROM price_history WHERE product_id = ?",
+                "SELECT EXISTS (SELECT 1 FROM price_history WHERE product_id = ?)",
                 (product_id,)
             )
-            return self.cursor.fetchone()[0] > 0
+            return self.cursor.fetchone()[0] == 1
         except sqlite3.Error as e:
             logger.error(f"Ошибка при проверке истории цен: {e}")
             return False
@@ -198,6 +280,40 @@ class Database:
             logger.error(f"Ошибка при обновлении цены товара {product_id}: {e}")
             return False
 
+    def update_prices(self, rows: List[Tuple[int, int, str]]) -> bool:
+        """Пакетное обновление цен одной транзакцией.
+
+        rows - список (product_id, new_price, timestamp) в порядке изменения.
+        """
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE prices SET last_price = ? WHERE id = ?",
+                    [(price, product_id) for product_id, price, _ in rows]
+                )
+                self.conn.executemany(
+                    "INSERT INTO price_history (product_id, price, timestamp) VALUES (?, ?, ?)",
+                    rows
+                )
+            logger.info(f"Пакетно обновлены цены {len(rows)} товаров")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при пакетном обновлении цен: {e}")
+            return False
+
+    def mark_checked(self, rows: List[Tuple[str, int]]) -> bool:
+        """Пакетная отметка времени проверки товаров.
+
+        rows - список (timestamp, product_id).
+        """
+        try:
+            with self.conn:
+                self.conn.executemany("UPDATE prices SET checked_at = ? WHERE id = ?", rows)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при отметке времени проверки товаров: {e}")
+            return False
+
     def set_threshold(self, product_id: int, user_id: int, threshold: int) -> bool:
         """Установка индивидуального порога изменения цены."""
         try:
@@ -212,38 +328,219 @@ class Database:
             logger.error(f"Ошибка при установке порога: {e}")
             return False
 
-    def get_all_products(self) -> List[Tuple]:
-        """Получение всех отслеживаемых товаров."""
+    def get_all_products(self) -> List[Product]:
+        """Получение всех отслеживаемых товаров.
+
+        Первыми идут товары, которые дольше всего не проверялись.
+        """
         try:
-            self.cursor.execute("SELECT id, user_id, url, last_price, threshold FROM prices")
-            return self.cursor.fetchall()
+            self.cursor.execute(f"""
+                SELECT {PRODUCT_COLUMNS} FROM prices
+                ORDER BY checked_at IS NOT NULL, checked_at
+            """)
+            return [Product(*row) for row in self.cursor.fetchall()]
         except sqlite3.Error as e:
             logger.error(f"Ошибка при получении всех товаров: {e}")
             return []
 
-    def get_price_history(self, product_id: int, hours: int = 24) -> List[Tuple]:
-        """Получение истории цен товара за указанный период."""
-        try:
-            self.cursor.execute("""
-                SELECT price, timestamp 
+    def _get_setting(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        self.cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
+        result = self.cursor.fetchone()
+        return result[0] if result else default
+
+    @staticmethod
+    def _rollup_points(table: str, span: str, bucket_since: str) -> str:
+        """Точки агрегатов одного уровня хранения.
+
+        Для каждого интервала выбираются минимум и максимум (в начале
+        интервала, если они различаются) и последняя цена (в конце
+        интервала), чтобы кратковременные скачки цены не пропадали с графика.
+        """
+        return f"""
+            SELECT bucket AS ts, min_price AS price FROM {table}
+            WHERE product_id = ? AND bucket >= {bucket_since} AND min_price < max_price
+            UNION ALL
+            SELECT bucket, max_price FROM {table}
+            WHERE product_id = ? AND bucket >= {bucket_since} AND min_price < max_price
+            UNION ALL
+            SELECT datetime(bucket, '{span}'), last_price FROM {table}
+            WHERE product_id = ? AND bucket >= {bucket_since}
+        """
+
+    def _select_price_history(self, product_id: int, hours: int, columns: str, order_by: int) -> None:
+        """Выполнение запроса истории цен с выбором уровня хранения.
+
+        Короткие периоды читаются из исходных записей, длинные - из
+        почасовых или посуточных агрегатов (минимум, максимум и последняя
+        цена в интервале) с досыпкой еще не агрегированных записей. В
+        columns поля {price} и {ts} подставляются для каждой таблицы.
+        """
+        since = (datetime.now(timezone.utc) - timedelta(hours=hours)).strftime(TIMESTAMP_FORMAT)
+        raw = columns.format(price='price', ts='timestamp')
+        rollup = columns.format(price='price', ts='ts')
+        if hours <= HISTORY_RAW_HOURS:
+            self.cursor.execute(f"""
+                SELECT {raw}
                 FROM price_history 
                 WHERE product_id = ? 
-                AND timestamp >= datetime('now', ?)
+                AND timestamp >= ?
                 ORDER BY timestamp
-            """, (product_id, f'-{hours} hours'))
-            return self.cursor.fetchall()
+            """, (product_id, since))
+            return
+
+        hourly_until = self._get_setting('history_hourly_until', '')
+        daily_until = self._get_setting('history_daily_until', '')
+        if hours <= HISTORY_HOURLY_DAYS * 24:
+            self.cursor.execute(f"""
+                SELECT {rollup} FROM ({self._rollup_points('price_history_hourly', '+59 minutes', '?')})
+                UNION ALL
+                SELECT {raw} FROM price_history
+                WHERE product_id = ? AND timestamp >= MAX(?, ?)
+                ORDER BY {order_by}
+            """, (product_id, since) * 3 + (product_id, since, hourly_until))
+        else:
+            self.cursor.execute(f"""
+                SELECT {rollup} FROM ({self._rollup_points('price_history_daily', '+1439 minutes', '?')})
+                UNION ALL
+                SELECT {rollup} FROM ({self._rollup_points('price_history_hourly', '+59 minutes', 'MAX(?, ?)')})
+                UNION ALL
+                SELECT {raw} FROM price_history
+                WHERE product_id = ? AND timestamp >= MAX(?, ?)
+                ORDER BY {order_by}
+            """, (product_id, since) * 3 + (product_id, since, daily_until) * 3 + (product_id, since, hourly_until))
+
+    def get_price_history(self, product_id: int, hours: int = 24) -> List[PricePoint]:
+        """Получение истории цен товара за указанный период."""
+        try:
+            self._select_price_history(product_id, hours, "{price}, {ts}", order_by=2)
+            return [PricePoint(*row) for row in self.cursor.fetchall()]
         except sqlite3.Error as e:
             logger.error(f"Ошибка при получении истории цен: {e}")
             return []
 
-    def get_product(self, product_id: int) -> Optional[Tuple]:
-        """Получение информации о конкретном товаре."""
+    def get_price_history_arrays(self, product_id: int, hours: int = 24) -> Tuple['np.ndarray', 'np.ndarray']:
+        """История цен за период в виде массивов NumPy.
+
+        Возвращает (timestamps, prices): время в секундах Unix (int64, UTC)
+        и цены (int32), отсортированные по времени.
+        """
+        import numpy as np
+
+        try:
+            self._select_price_history(
+                product_id, hours, "CAST(strftime('%s', {ts}) AS INTEGER), {price}", order_by=1
+            )
+            rows = self.cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка при получении истории цен: {e}")
+            rows = []
+        flat = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows))
+        pairs = flat.reshape(-1, 2)
+        return pairs[:, 0].copy(), pairs[:, 1].astype(np.int32)
+
+    def compact_price_history(self) -> bool:
+        """Обновление агрегатов истории цен и удаление устаревших записей.
+
+        Завершенные часы сворачиваются в price_history_hourly, завершенные
+        сутки - в price_history_daily. Исходные записи хранятся
+        HISTORY_RAW_HOURS часов, почасовые агрегаты - HISTORY_HOURLY_DAYS дней.
+        Последняя исходная запись каждого товара не удаляется, чтобы
+        get_last_history_id() и has_price_history() не менялись при сжатии.
+        Последний обработанный интервал пересчитывается повторно, чтобы
+        учесть записи, попавшие в базу с задержкой.
+        """
+        try:
+            now = datetime.now(timezone.utc)
+            hour_start = now.replace(minute=0, second=0, microsecond=0)
+            day_start = hour_start.replace(hour=0)
+
+            hourly_until = self._get_setting('history_hourly_until')
+            hourly_from = (
+                datetime.strptime(hourly_until, TIMESTAMP_FORMAT) - timedelta(hours=1)
+            ).strftime(TIMESTAMP_FORMAT) if hourly_until else ''
+            daily_until = self._get_setting('history_daily_until')
+            daily_from = (
+                datetime.strptime(daily_until, TIMESTAMP_FORMAT) - timedelta(days=1)
+            ).strftime(TIMESTAMP_FORMAT) if daily_until else ''
+            new_hourly_until = hour_start.strftime(TIMESTAMP_FORMAT)
+            new_daily_until = day_start.strftime(TIMESTAMP_FORMAT)
+
+            with self.conn:
+                self.conn.execute("""
+                    INSERT OR REPLACE INTO price_history_hourly
+                        (product_id, bucket, min_price, max_price, last_price)
+                    SELECT h.product_id, h.bucket, h.min_price, h.max_price, p.price
+                    FROM (
+                        SELECT product_id, strftime('%Y-%m-%d %H:00:00', timestamp) AS bucket,
+                               MIN(price) AS min_price, MAX(price) AS max_price, MAX(id) AS last_id
+                        FROM price_history
+                        WHERE timestamp >= ? AND timestamp < ?
+                        GROUP BY product_id, bucket
+                    ) h
+                    JOIN price_history p ON p.id = h.last_id
+                """, (hourly_from, new_hourly_until))
+                self.conn.execute("""
+                    INSERT OR REPLACE INTO price_history_daily
+                        (product_id, bucket, min_price, max_price, last_price)
+                    SELECT d.product_id, d.bucket, d.min_price, d.max_price, h.last_price
+                    FROM (
+                        SELECT product_id, strftime('%Y-%m-%d 00:00:00', bucket) AS bucket,
+                               MIN(min_price) AS min_price, MAX(max_price) AS max_price,
+                               MAX(bucket) AS last_bucket
+                        FROM price_history_hourly
+                        WHERE bucket >= ? AND bucket < ?
+                        GROUP BY product_id, strftime('%Y-%m-%d 00:00:00', bucket)
+                    ) d
+                    JOIN price_history_hourly h
+                        ON h.product_id = d.product_id AND h.bucket = d.last_bucket
+                """, (daily_from, new_daily_until))
+
+                raw_cutoff = min(
+                    (now - timedelta(hours=HISTORY_RAW_HOURS)).strftime(TIMESTAMP_FORMAT), new_hourly_until
+                )
+                raw_deleted = self.conn.execute("""
+                    DELETE FROM price_history
+                    WHERE timestamp < ?
+                    AND id NOT IN (SELECT MAX(id) FROM price_history GROUP BY product_id)
+                """, (raw_cutoff,)).rowcount
+                hourly_cutoff = min(
+                    (now - timedelta(days=HISTORY_HOURLY_DAYS)).strftime(TIMESTAMP_FORMAT), new_daily_until
+                )
+                hourly_deleted = self.conn.execute(
+                    "DELETE FROM price_history_hourly WHERE bucket < ?", (hourly_cutoff,)
+                ).rowcount
+
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                    [('history_hourly_until', new_hourly_until), ('history_daily_until', new_daily_until)]
+                )
+            logger.info(
+                f"Сжатие истории цен: удалено {raw_deleted} исходных записей "
+                f"и {hourly_deleted} почасовых агрегатов"
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при сжатии истории цен: {e}")
+            return False
+
+    def get_last_history_id(self, product_id: int) -> int:
+        """Идентификатор последней записи истории цен товара (0, если истории нет)."""
         try:
             self.cursor.execute(
-                "SELECT id, url, name, last_price, threshold FROM prices WHERE id = ?",
+                "SELECT MAX(id) FROM price_history WHERE product_id = ?",
                 (product_id,)
             )
-            return self.cursor.fetchone()
+            return self.cursor.fetchone()[0] or 0
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка при получении последней записи истории цен: {e}")
+            return 0
+
+    def get_product(self, product_id: int) -> Optional[Product]:
+        """Получение информации о конкретном товаре."""
+        try:
+            self.cursor.execute(f"SELECT {PRODUCT_COLUMNS} FROM prices WHERE id = ?", (product_id,))
+            row = self.cursor.fetchone()
+            return Product(*row) if row else None
         except Exception as e:
             logger.error(f"Ошибка при получении товара: {e}")
             return None
@@ -254,5 +551,235 @@ class Database:
             self.conn.close()
             logger.info("Соединение с базой данных закрыто")
 
+class AsyncDatabase:
+    """Асинхронный доступ к базе данных без блокировки цикла событий.
+
+    Все изменения выполняются в отдельном потоке записи с единственным
+    соединением, чтение идет через пул потоков, у каждого из которых свое
+    соединение. Методы повторяют интерфейс Database.
+    """
+
+    def __init__(self, db_path: str = "prices.db", readers: int = 4,
+                 write_batch_size: int = 500, write_flush_interval: float = 5.0):
+        self.db_path = db_path
+        self.write_batch_size = write_batch_size
+        self.write_flush_interval = write_flush_interval
+        # Буфер отложенной записи цен: (product_id, price, timestamp)
+        self._price_buffer: List[Tuple[int, int, str]] = []
+        # Время последней проверки товаров: product_id -> timestamp
+        self._checked_buffer: Dict[int, str] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._writer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        self._reader_executor = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='db-reader')
+        # Товары и интервал проверки в памяти: их чтение не обращается к диску
+        self.catalog = ProductCatalog()
+        self._check_interval: Optional[int] = None
+        self._local = threading.local()
+        self._readers: List[Database] = []
+        self._readers_lock = threading.Lock()
+        # Схема создается в потоке записи до первого обращения читателей
+        self._writer = self._writer_executor.submit(Database, db_path).result()
+
+    def _reader(self) -> Database:
+        """Соединение для чтения текущего потока пула."""
+        reader = getattr(self._local, 'db', None)
+        if reader is None:
+            reader = self._local.db = Database(self.db_path, init=False)
+            with self._readers_lock:
+                self._readers.append(reader)
+        return reader
+
+    async def _read(self, method: str, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._reader_executor, lambda: getattr(self._reader(), method)(*args)
+        )
+
+    async def _write(self, method: str, *args):
+        loop = asyncio.get_running_loop()
+        with DB_WRITE_SECONDS.time(method=method):
+            return await loop.run_in_executor(
+                self._writer_executor, lambda: getattr(self._writer, method)(*args)
+            )
+
+    @property
+    def pending_writes(self) -> int:
+        """Число отложенных записей, ожидающих сброса в базу."""
+        return len(self._price_buffer) + len(self._checked_buffer)
+
+    async def get_check_interval(self) -> int:
+        """Получение интервала проверки цен."""
+        if self._check_interval is None:
+            self._check_interval = await self._read('get_check_interval')
+        return self._check_interval
+
+    async def set_check_interval(self, interval: int) -> bool:
+        """Установка интервала проверки цен."""
+        if await self._write('set_check_interval', interval):
+            self._check_interval = interval
+            return True
+        return False
+
+    async def load_catalog(self) -> None:
+        """Загрузка всех товаров в каталог в памяти."""
+        self.catalog.load(await self._read('get_all_products'))
+        logger.info(f"Загружен {self.catalog}")
+
+    async def add_product(self, user_id: int, url: str, name: str, price: int, threshold: int = 500) -> Optional[int]:
+        """Добавление нового товара для отслеживания. Возвращает id товара."""
+        product_id = await self._write('add_product', user_id, url, name, price, threshold)
+        if product_id:
+            self.catalog.add(Product(product_id, user_id, url, name, price, threshold))
+        return product_id
+
+    async def get_user_products(self, user_id: int) -> List[Product]:
+        """Получение списка товаров пользователя."""
+        if self.catalog.loaded:
+            return self.catalog.user_products(user_id)
+        self.catalog.misses += 1
+        return await self._read('get_user_products', user_id)
+
+    async def delete_product(self, product_id: int, user_id: int) -> bool:
+        """Удаление товара из отслеживания."""
+        if await self._write('delete_product', product_id, user_id):
+            self.catalog.remove(product_id, user_id)
+            return True
+        return False
+
+    async def has_price_history(self, product_id: int) -> bool:
+        """Проверка наличия истории цен для товара."""
+        return await self._read('has_price_history', product_id)
+
+    async def update_price(self, product_id: int, new_price: int) -> bool:
+        """Обновление цены товара и добавление записи в историю."""
+        if await self._write('update_price', product_id, new_price):
+            self.catalog.set_price(product_id, new_price)
+            return True
+        return False
+
+    def queue_price_update(self, product_id: int, new_price: int) -> None:
+        """Отложенное обновление цены: запись попадет в базу при сбросе буфера."""
+        timestamp = datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+        self._price_buffer.append((product_id, new_price, timestamp))
+        # Каталог обновляется сразу, не дожидаясь записи в базу
+        self.catalog.set_price(product_id, new_price)
+        self._request_flush_if_full()
+
+    def has_pending_price(self, product_id: int) -> bool:
+        """Есть ли у товара цены, еще не записанные в базу."""
+        return any(row[0] == product_id for row in self._price_buffer)
+
+    def queue_checked(self, product_id: int) -> None:
+        """Отложенная отметка времени проверки товара."""
+        checked_at = datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+        self._checked_buffer[product_id] = checked_at
+        self.catalog.set_checked(product_id, checked_at)
+        self._request_flush_if_full()
+
+    def _request_flush_if_full(self) -> None:
+        pending = len(self._price_buffer) + len(self._checked_buffer)
+        if pending >= self.write_batch_size and self._flush_requested is not None:
+            self._flush_requested.set()
+
+    async def flush_price_updates(self) -> bool:
+        """Запись накопленных обновлений цен и времени проверки."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            ok = True
+            if self._price_buffer:
+                rows, self._price_buffer = self._price_buffer, []
+                if not await self._write('update_prices', rows):
+                    # Возвращаем строки в начало буфера, чтобы повторить при следующем сбросе
+                    self._price_buffer[:0] = rows
+                    ok = False
+            if self._checked_buffer:
+                checked, self._checked_buffer = self._checked_buffer, {}
+                if not await self._write('mark_checked', [(ts, product_id) for product_id, ts in checked.items()]):
+                    # Более свежие отметки, появившиеся за время записи, не затираем
+                    self._checked_buffer = {**checked, **self._checked_buffer}
+                    ok = False
+            return ok
+
+    async def _flush_loop(self) -> None:
+        """Фоновый сброс буфера по времени или при заполнении пакета."""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.write_flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush_price_updates()
+
+    async def start(self) -> None:
+        """Загрузка каталога и запуск фонового сброса отложенной записи."""
+        if not self.catalog.loaded:
+            await self.load_catalog()
+        await self.get_check_interval()
+        if self._flush_task is None:
+            self._flush_lock = asyncio.Lock()
+            self._flush_requested = asyncio.Event()
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def set_threshold(self, product_id: int, user_id: int, threshold: int) -> bool:
+        """Установка индивидуального порога изменения цены."""
+        if await self._write('set_threshold', product_id, user_id, threshold):
+            self.catalog.set_threshold(product_id, user_id, threshold)
+            return True
+        return False
+
+    async def get_all_products(self) -> List[Product]:
+        """Получение всех отслеживаемых товаров."""
+        if self.catalog.loaded:
+            return self.catalog.all_products()
+        self.catalog.misses += 1
+        return await self._read('get_all_products')
+
+    async def get_price_history(self, product_id: int, hours: int = 24) -> List[PricePoint]:
+        """Получение истории цен товара за указанный период."""
+        return await self._read('get_price_history', product_id, hours)
+
+    async def get_price_history_arrays(self, product_id: int, hours: int = 24) -> Tuple['np.ndarray', 'np.ndarray']:
+        """История цен за период в виде массивов NumPy (время Unix, цены)."""
+        return await self._read('get_price_history_arrays', product_id, hours)
+
+    async def get_last_history_id(self, product_id: int) -> int:
+        """Идентификатор последней записи истории цен товара."""
+        return await self._read('get_last_history_id', product_id)
+
+    async def get_product(self, product_id: int) -> Optional[Product]:
+        """Получение информации о конкретном товаре."""
+        if self.catalog.loaded:
+            return self.catalog.product(product_id)
+        self.catalog.misses += 1
+        return await self._read('get_product', product_id)
+
+    async def compact_price_history(self) -> bool:
+        """Обновление агрегатов истории цен и удаление устаревших записей."""
+        await self.flush_price_updates()
+        return await self._write('compact_price_history')
+
+    async def close(self) -> None:
+        """Сброс буфера, остановка потоков и закрытие всех соединений."""
+        if self._flush_task is not None:
+            # Дожидаемся текущего сброса, чтобы не прервать его посередине
+            async with self._flush_lock:
+                self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush_price_updates()
+        await asyncio.to_thread(self._reader_executor.shutdown, True)
+        for reader in self._readers:
+            reader.close()
+        self._readers.clear()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._writer_executor, self._writer.close)
+        self._writer_executor.shutdown(wait=True)
+
 if __name__ == "__main__":
     init_db()
\ No newline at end of file
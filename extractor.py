@@ -0,0 +1,206 @@
+import html
+import logging
+import re
+from typing import Dict, List, Optional
+
+logger = logging.getLogger('bot')
+
+# Маркеры карточки товара на странице Яндекс.Маркета
+TITLE_ATTR = 'productCardTitle'
+PRICE_ATTR = 'snippet-price-current'
+
+TAG_RE = re.compile(rb'<[^>]*>')
+
+
+def _start_tag_re(tag: str, attr: str) -> 're.Pattern':
+    """Регулярное выражение для открывающего тега с заданным data-auto."""
+    return re.compile(
+        rb'<' + tag.encode() + rb'\b[^>]*?\bdata-auto\s*=\s*["\']'
+        + re.escape(attr.encode()) + rb'["\'][^>]*>',
+        re.IGNORECASE
+    )
+
+
+TITLE_START_RE = _start_tag_re('h1', TITLE_ATTR)
+PRICE_START_RE = _start_tag_re('span', PRICE_ATTR)
+
+
+def parse_price(text: str) -> int:
+    """Преобразование текста цены ('12 990 ₽') в число."""
+    # Очищаем цену от всех невидимых символов и пробелов
+    price_text = text.strip()
+    # Удаляем все невидимые символы Unicode
+    price_text = ''.join(char for char in price_text if char.isprintable())
+    # Удаляем все пробелы и символ рубля
+    price_text = price_text.replace(' ', '').replace('₽', '')
+    return int(price_text)
+
+
+def build_result(name: str, price_text: str) -> Optional[Dict]:
+    """Формирование результата извлечения из найденных текстов."""
+    try:
+        price = parse_price(price_text)
+    except ValueError as e:
+        logger.error(f"Ошибка при преобразовании цены '{price_text}': {e}")
+        return None
+    return {
+        'name': name.strip(),
+        'price': price
+    }
+
+
+class SoupExtractor:
+    """Эталонное извлечение через полный разбор страницы BeautifulSoup."""
+
+    name = 'soup'
+
+    def extract(self, body: bytes, encoding: str = 'utf-8') -> Optional[Dict]:
+        """Извлечение названия и цены товара из HTML страницы."""
+        # BeautifulSoup нужен только для запасного пути, импортируем при первом вызове
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(body.decode(encoding, errors='replace'), 'html.parser')
+
+        # Получаем название товара
+        name_elem = soup.find('h1', {'data-auto': TITLE_ATTR})
+        if not name_elem:
+            logger.debug("Не найден элемент с названием товара")
+            return None
+
+        # Получаем цену
+        price_elem = soup.find('span', {'data-auto': PRICE_ATTR})
+        if not price_elem:
+            logger.debug("Не найден элемент с ценой товара")
+            return None
+
+        return build_result(name_elem.text, price_elem.text)
+
+
+class FastExtractor:
+    """Быстрое извлечение поиском маркеров data-auto в байтах страницы.
+
+    Полное дерево документа не строится: ищется открывающий тег с нужным
+    атрибутом и парный ему закрывающий. Если маркеры не найдены, страница
+    передается запасному извлекателю.
+    """
+
+    name = 'fast'
+
+    def __init__(self, fallback: Optional[SoupExtractor] = None):
+        self.fallback = fallback
+
+    @staticmethod
+    def inner_html(body: bytes, tag: bytes, start: int) -> Optional[bytes]:
+        """Содержимое элемента от конца открывающего тега до парного закрывающего.
+
+        Возвращает None, если закрывающий тег еще не встретился.
+        """
+        depth = 1
+        tag_re = re.compile(rb'<(/?)' + tag + rb'\b[^>]*>', re.IGNORECASE)
+        for match in tag_re.finditer(body, start):
+            if match.group(1):
+                depth -= 1
+                if depth == 0:
+                    return body[start:match.start()]
+            elif not match.group(0).endswith(b'/>'):
+                depth += 1
+        return None
+
+    @staticmethod
+    def text_of(inner: bytes, encoding: str) -> str:
+        """Текст элемента без тегов и HTML-сущностей."""
+        return html.unescape(TAG_RE.sub(b'', inner).decode(encoding, errors='replace'))
+
+    def find_text(self, body: bytes, pattern: 're.Pattern', tag: bytes, encoding: str) -> Optional[str]:
+        """Текст первого элемента, открывающий тег которого совпал с pattern."""
+        match = pattern.search(body)
+        if not match:
+            return None
+        inner = self.inner_html(body, tag, match.end())
+        if inner is None:
+            return None
+        return self.text_of(inner, encoding)
+
+    def extract(self, body: bytes, encoding: str = 'utf-8') -> Optional[Dict]:
+        """Извлечение названия и цены товара из HTML страницы."""
+        name = self.find_text(body, TITLE_START_RE, b'h1', encoding)
+        price_text = self.find_text(body, PRICE_START_RE, b'span', encoding) if name is not None else None
+        if name is None or price_text is None:
+            if self.fallback is None:
+                return None
+            logger.debug("Маркеры карточки товара не найдены, выполняется полный разбор страницы")
+            return self.fallback.extract(body, encoding)
+        return build_result(name, price_text)
+
+
+def create_extractor(name: str):
+    """Создание извлекателя по имени из настроек."""
+    if name == SoupExtractor.name:
+        return SoupExtractor()
+    if name == FastExtractor.name:
+        return FastExtractor(fallback=SoupExtractor())
+    raise ValueError(f"Неизвестный извлекатель HTML: {name}")
+
+
+class IncrementalExtractor:
+    """Извлечение названия и цены по мере получения страницы частями.
+
+    Маркеры ищутся только в хвосте страницы, в котором еще может
+    начинаться нужный тег. Прочитанные части сохраняются, пока оба
+    элемента не найдены: если маркеры так и не встретятся, body() отдает
+    страницу целиком для полного разбора. feed() возвращает True, как
+    только оба элемента найдены целиком.
+    """
+
+    # Сколько байт хвоста сохранять, чтобы не разрезать открывающий тег
+    KEEP_TAIL = 4096
+
+    def __init__(self, encoding: str = 'utf-8'):
+        self.encoding = encoding
+        self.bytes_fed = 0
+        self._buffer = bytearray()
+        self._chunks: List[bytes] = []
+        self._found: Dict[str, str] = {}
+        self._targets = {
+            'name': (TITLE_START_RE, b'h1'),
+            'price': (PRICE_START_RE, b'span'),
+        }
+
+    @property
+    def done(self) -> bool:
+        return len(self._found) == len(self._targets)
+
+    def feed(self, chunk: bytes) -> bool:
+        """Добавление очередной части страницы."""
+        self.bytes_fed += len(chunk)
+        self._chunks.append(chunk)
+        self._buffer += chunk
+        keep_from = max(0, len(self._buffer) - self.KEEP_TAIL)
+        for key, (pattern, tag) in self._targets.items():
+            if key in self._found:
+                continue
+            match = pattern.search(self._buffer)
+            if not match:
+                continue
+            inner = FastExtractor.inner_html(self._buffer, tag, match.end())
+            if inner is None:
+                # Элемент начался, но еще не закрылся: держим его в буфере
+                keep_from = min(keep_from, match.start())
+            else:
+                self._found[key] = FastExtractor.text_of(inner, self.encoding)
+        if self.done:
+            self._buffer.clear()
+            self._chunks.clear()
+            return True
+        del self._buffer[:keep_from]
+        return False
+
+    def body(self) -> bytes:
+        """Все прочитанные части страницы, пока маркеры не найдены."""
+        return b''.join(self._chunks)
+
+    def result(self) -> Optional[Dict]:
+        """Результат извлечения или None, если маркеры не найдены."""
+        if not self.done:
+            return None
+        return build_result(self._found['name'], self._found['price'])
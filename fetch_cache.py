@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Mapping, Optional
+
+from sweep import normalize_url
+
+logger = logging.getLogger('bot')
+
+
+def body_hash(body: bytes) -> bytes:
+    """Короткий хэш тела страницы для сравнения с прошлой загрузкой."""
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+
+class FetchEntry:
+    """Сведения о последней успешной загрузке страницы."""
+
+    __slots__ = ('etag', 'last_modified', 'body_hash', 'product_info', 'fetched_at')
+
+    def __init__(self, etag: Optional[str], last_modified: Optional[str],
+                 body_hash: Optional[bytes], product_info: Dict, fetched_at: float):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body_hash = body_hash
+        self.product_info = product_info
+        self.fetched_at = fetched_at
+
+
+class FetchCache:
+    """Кэш загрузок страниц товаров по нормализованному URL.
+
+    Хранит ETag/Last-Modified для условных запросов, хэш тела для пропуска
+    повторного разбора и результат разбора. Недавний результат (не старше
+    ttl секунд) можно отдать вовсе без запроса.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, FetchEntry]' = OrderedDict()
+        # Счетчики эффективности кэша
+        self.fresh_hits = 0
+        self.not_modified = 0
+        self.hash_hits = 0
+        self.misses = 0
+
+    def _get(self, url: str) -> Optional[FetchEntry]:
+        key = normalize_url(url)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def get_fresh(self, url: str, max_age: Optional[float] = None) -> Optional[Dict]:
+        """Результат загрузки не старше max_age (по умолчанию ttl) секунд."""
+        max_age = self.ttl if max_age is None else max_age
+        entry = self._get(url)
+        if entry is None or time.monotonic() - entry.fetched_at > max_age:
+            return None
+        self.fresh_hits += 1
+        return dict(entry.product_info)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Заголовки условного запроса по сохраненным ETag и Last-Modified."""
+        entry = self._get(url)
+        headers: Dict[str, str] = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def revalidated(self, url: str) -> Optional[Dict]:
+        """Результат прошлой загрузки после ответа 304 Not Modified."""
+        entry = self._get(url)
+        if entry is None:
+            return None
+        self.not_modified += 1
+        entry.fetched_at = time.monotonic()
+        return dict(entry.product_info)
+
+    def match_body(self, url: str, digest: bytes) -> Optional[Dict]:
+        """Результат прошлого разбора, если тело страницы не изменилось."""
+        entry = self._get(url)
+        if entry is None or entry.body_hash != digest:
+            return None
+        self.hash_hits += 1
+        entry.fetched_at = time.monotonic()
+        return dict(entry.product_info)
+
+    def store(self, url: str, headers: Mapping[str, str], digest: Optional[bytes], product_info: Dict) -> None:
+        """Сохранение результата загрузки и разбора страницы."""
+        self.misses += 1
+        key = normalize_url(url)
+        self._entries[key] = FetchEntry(
+            headers.get('ETag'),
+            headers.get('Last-Modified'),
+            digest,
+            dict(product_info),
+            time.monotonic(),
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self.fresh_hits + self.not_modified + self.hash_hits
+        total = hits + self.misses
+        return hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"кэш загрузок: свежих {self.fresh_hits}, 304 {self.not_modified}, "
+            f"тело не изменилось {self.hash_hits}, промахов {self.misses} "
+            f"(попаданий {self.hit_rate:.0%})"
+        )
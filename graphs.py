@@ -0,0 +1,168 @@
+import asyncio
+import io
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# NumPy и matplotlib импортируются при первом построении графика, чтобы не
+# замедлять запуск бота
+logger = logging.getLogger('bot')
+
+
+# Размер графика и плотность пикселей
+FIGURE_SIZE = (10, 6)
+FIGURE_DPI = 100
+
+
+def downsample_minmax(timestamps: 'np.ndarray', prices: 'np.ndarray', buckets: int) -> Tuple['np.ndarray', 'np.ndarray']:
+    """Прореживание ряда до buckets интервалов с сохранением минимума и максимума.
+
+    Из каждого интервала времени остаются точки с минимальной и
+    максимальной ценой, поэтому пики и провалы не теряются, а число точек
+    не превышает 2 * buckets независимо от длины истории.
+    """
+    if len(timestamps) <= 2 * buckets:
+        return timestamps, prices
+    import numpy as np
+
+    edges = np.linspace(timestamps[0], timestamps[-1], buckets + 1)
+    bucket_ids = np.searchsorted(edges[1:-1], timestamps, side='right')
+    # Сортировка по (интервал, цена): первая точка интервала - минимум, последняя - максимум
+    order = np.lexsort((prices, bucket_ids))
+    sorted_buckets = bucket_ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+    ends = np.r_[starts[1:], len(order)] - 1
+    keep = np.unique(np.concatenate((order[starts], order[ends])))
+    return timestamps[keep], prices[keep]
+
+
+def render_price_graph(timestamps: 'np.ndarray', prices: 'np.ndarray', product_name: str) -> bytes:
+    """Построение PNG-графика изменения цены.
+
+    timestamps - время в секундах Unix, prices - цены. Ряд заранее
+    прореживается до ширины графика в пикселях. Используется объектный API
+    matplotlib с собственной фигурой и холстом Agg, поэтому графики можно
+    строить параллельно из разных потоков.
+    """
+    import numpy as np
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.dates import AutoDateLocator, DateFormatter
+    from matplotlib.figure import Figure
+
+    width_px = FIGURE_SIZE[0] * FIGURE_DPI
+    timestamps, prices = downsample_minmax(timestamps, prices, width_px // 2)
+    dates = timestamps.astype('datetime64[s]')
+
+    figure = Figure(figsize=FIGURE_SIZE, dpi=FIGURE_DPI)
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    ax.plot(dates, prices, marker='o' if len(dates) <= 200 else None)
+    ax.set_title(f'Изменение цены: {product_name}')
+    ax.set_xlabel('Время')
+    ax.set_ylabel('Цена (₽)')
+    ax.grid(True)
+    ax.tick_params(axis='x', labelrotation=45)
+
+    # Устанавливаем разумные пределы по времени
+    if len(dates) > 1:
+        time_range = dates[-1] - dates[0]
+        ax.set_xlim(dates[0] - time_range // 10, dates[-1] + time_range // 10)
+    else:
+        # Если только одна точка, показываем период в 1 час
+        half_hour = np.timedelta64(30, 'm')
+        ax.set_xlim(dates[0] - half_hour, dates[0] + half_hour)
+
+    # Форматируем метки времени и интервал между ними
+    ax.xaxis.set_major_formatter(DateFormatter('%d.%m %H:%M'))
+    ax.xaxis.set_major_locator(AutoDateLocator())
+
+    buf = io.BytesIO()
+    figure.savefig(buf, format='png', bbox_inches='tight')
+    return buf.getvalue()
+
+
+class GraphRenderer:
+    """Построение графиков в пуле потоков с LRU-кэшем готовых PNG.
+
+    Ключ кэша должен меняться при появлении новых данных, например
+    (product_id, hours, id последней записи истории). Одновременные запросы
+    одного графика ждут единственного построения.
+    """
+
+    def __init__(self, workers: int = 2, max_entries: int = 128, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='graph')
+        self._cache: 'OrderedDict[Hashable, bytes]' = OrderedDict()
+        self._cache_bytes = 0
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _get_cached(self, key: Hashable) -> Optional[bytes]:
+        data = self._cache.get(key)
+        if data is not None:
+            self._cache.move_to_end(key)
+        return data
+
+    def _store(self, key: Hashable, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        self._cache[key] = data
+        self._cache_bytes += len(data)
+        while len(self._cache) > self.max_entries or self._cache_bytes > self.max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+
+    async def get_or_render(
+        self,
+        key: Hashable,
+        load: Callable[[], Awaitable[Optional[Tuple['np.ndarray', 'np.ndarray', str]]]],
+    ) -> Optional[bytes]:
+        """PNG из кэша или построенный по данным из load().
+
+        load возвращает (время, цены, название товара) или None, если данных нет.
+        """
+        cached = self._get_cached(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            # Построение идет отдельной задачей: отмена запроса, который его
+            # начал, не прерывает ожидание остальных
+            task = asyncio.create_task(self._render(key, load))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    async def _render(
+        self,
+        key: Hashable,
+        load: Callable[[], Awaitable[Optional[Tuple['np.ndarray', 'np.ndarray', str]]]],
+    ) -> Optional[bytes]:
+        loaded = await load()
+        if not loaded:
+            return None
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(self._executor, render_price_graph, *loaded)
+        self._store(key, data)
+        return data
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Ошибка передается ожидающим; если их не осталось, не оставляем ее «непрочитанной»
+        if not task.cancelled():
+            task.exception()
+
+    def shutdown(self) -> None:
+        """Остановка пула построения графиков."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
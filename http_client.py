@@ -0,0 +1,77 @@
+import logging
+from typing import Dict, Optional
+
+import aiohttp
+from aiohttp import ClientTimeout
+
+logger = logging.getLogger('bot')
+
+
+class HttpClient:
+    """Долгоживущий HTTP-клиент с общим пулом соединений.
+
+    Одна сессия используется всеми запросами к Яндекс.Маркету, поэтому
+    DNS, TCP и TLS не устанавливаются заново для каждого товара.
+    """
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        limit: int = 100,
+        limit_per_host: int = 10,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 60.0,
+        timeout: float = 30.0,
+    ):
+        self.headers = headers or {}
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Счетчики для оценки трафика
+        self.requests = 0
+        self.bytes_read = 0
+
+    async def start(self) -> None:
+        """Создание сессии и пула соединений."""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            headers=self.headers,
+            # Cookie передается заголовком, ответные cookie не накапливаем
+            cookie_jar=aiohttp.DummyCookieJar(),
+        )
+        logger.info(
+            f"HTTP-клиент запущен (пул: {self.limit}, на хост: {self.limit_per_host}, "
+            f"DNS TTL: {self.dns_cache_ttl} с)"
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Текущая сессия. Клиент должен быть запущен через start()."""
+        if self._session is None or self._session.closed:
+            raise RuntimeError("HTTP-клиент не запущен")
+        return self._session
+
+    def record(self, bytes_read: int) -> None:
+        """Учет выполненного запроса и прочитанных байт тела ответа."""
+        self.requests += 1
+        self.bytes_read += bytes_read
+
+    async def close(self) -> None:
+        """Закрытие сессии и всех соединений пула."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("HTTP-клиент остановлен")
+        self._session = None
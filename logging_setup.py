@@ -0,0 +1,79 @@
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Tuple
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Файл журнала для каждого логгера верхнего уровня
+LOG_FILES: Tuple[Tuple[str, str], ...] = (
+    ('aiogram', 'aiogram.log'),
+    ('database', 'database.log'),
+    ('bot', 'bot.log'),
+)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропуск только доли rate записей уровня INFO и ниже.
+
+    Предупреждения и ошибки проходят всегда.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Постановка записи в очередь без форматирования в вызывающем потоке.
+
+    Стандартный QueueHandler форматирует сообщение перед постановкой в
+    очередь. Очередь здесь внутрипроцессная, поэтому запись передается как
+    есть, а подстановка аргументов и запись в файл выполняются в потоке
+    QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                  sample_rates: Dict[str, float] = None) -> QueueListener:
+    """Настройка неблокирующего журналирования.
+
+    Логгеры только ставят записи в очередь, запись в файлы с ротацией по
+    размеру и вывод в консоль выполняет фоновый поток. sample_rates задает
+    долю сохраняемых INFO-записей для отдельных подсистем, например
+    {'bot.checks': 0.1}. Возвращает запущенный QueueListener, который нужно
+    остановить при завершении.
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    for name, filename in LOG_FILES:
+        file_handler = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        file_handler.setFormatter(formatter)
+        file_handler.addFilter(logging.Filter(name))
+        handlers.append(file_handler)
+    # Вывод в консоль для всех логгеров
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    handlers.append(console_handler)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    for name, _ in LOG_FILES:
+        subsystem_logger = logging.getLogger(name)
+        subsystem_logger.setLevel(logging.INFO)
+        subsystem_logger.addHandler(queue_handler)
+
+    for name, rate in (sample_rates or {}).items():
+        if rate < 1:
+            logging.getLogger(name).addFilter(SamplingFilter(rate))
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
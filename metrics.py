@@ -0,0 +1,223 @@
+import bisect
+import logging
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+logger = logging.getLogger('bot')
+
+# Границы корзин гистограмм по умолчанию, секунд
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    """Текущее значение, вычисляемое при каждом запросе метрик."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], Union[float, Dict[LabelValues, float]]],
+                 labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.read = read
+
+    def render(self) -> List[str]:
+        value = self.read()
+        values = value if isinstance(value, dict) else {(): value}
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class Histogram(_Metric):
+    """Распределение значений (как правило, длительностей) по корзинам."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Замер длительности блока with."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Набор метрик, отдаваемых в текстовом формате Prometheus."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], Union[float, Dict[LabelValues, float]]],
+              labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, read, labels))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            try:
+                body = metric.render()
+            except Exception as e:
+                logger.error(f"Ошибка при вычислении метрики {metric.name}: {e}")
+                continue
+            lines.extend(metric.header())
+            lines.extend(body)
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+FETCH_SECONDS = registry.histogram(
+    'price_bot_fetch_seconds', 'Длительность попытки загрузки страницы товара', ('outcome',)
+)
+PARSE_SECONDS = registry.histogram(
+    'price_bot_parse_seconds', 'Длительность извлечения названия и цены со страницы'
+)
+DB_WRITE_SECONDS = registry.histogram(
+    'price_bot_db_write_seconds', 'Длительность операций записи в базу данных', ('method',)
+)
+SWEEP_SECONDS = registry.histogram(
+    'price_bot_sweep_seconds', 'Длительность полной проверки цен',
+    buckets=(1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0)
+)
+NOTIFY_SECONDS = registry.histogram(
+    'price_bot_notification_seconds', 'Длительность отправки уведомления в Telegram'
+)
+CHECKS_TOTAL = registry.counter(
+    'price_bot_checks_total', 'Проверки страниц товаров по результату', ('result',)
+)
+FETCH_FAILURES_TOTAL = registry.counter(
+    'price_bot_fetch_failures_total', 'Ошибки загрузки страниц по классам', ('kind',)
+)
+NOTIFICATIONS_TOTAL = registry.counter(
+    'price_bot_notifications_total', 'Отправленные уведомления по результату', ('result',)
+)
+
+
+class MetricsServer:
+    """HTTP-сервер с единственным адресом /metrics."""
+
+    def __init__(self, registry: MetricsRegistry, host: str = '127.0.0.1', port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: Optional['web.AppRunner'] = None
+
+    async def _handle(self, request: 'web.Request') -> 'web.Response':
+        from aiohttp import web
+
+        return web.Response(text=self.registry.render(), content_type='text/plain', charset='utf-8')
+
+    async def start(self) -> None:
+        """Запуск сервера метрик."""
+        # Серверная часть aiohttp нужна только при включенных метриках
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Метрики доступны по адресу http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        """Остановка сервера метрик."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
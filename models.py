@@ -0,0 +1,23 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(slots=True)
+class Product:
+    """Отслеживаемый товар пользователя."""
+
+    id: int
+    user_id: int
+    url: str
+    name: str
+    last_price: int
+    threshold: int
+    checked_at: Optional[str] = None
+
+
+@dataclass(slots=True)
+class PricePoint:
+    """Запись истории цен товара."""
+
+    price: int
+    timestamp: str
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+
+from metrics import NOTIFICATIONS_TOTAL, NOTIFY_SECONDS
+from ratelimit import TokenBucket
+
+logger = logging.getLogger('aiogram')
+
+# Ограничение Telegram на длину одного сообщения
+MAX_MESSAGE_LENGTH = 4096
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Разбиение длинного текста на части по границам абзацев."""
+    parts: List[str] = []
+    current = ''
+    for block in text.split('\n\n'):
+        while len(block) > limit:
+            if current:
+                parts.append(current)
+                current = ''
+            parts.append(block[:limit])
+            block = block[limit:]
+        candidate = f"{current}\n\n{block}" if current else block
+        if len(candidate) > limit:
+            parts.append(current)
+            current = block
+        else:
+            current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+
+class Notifier:
+    """Асинхронная очередь уведомлений с ограничением частоты.
+
+    send() не ждет Telegram: сообщение ставится в очередь и отправляется
+    фоновыми воркерами с учетом общего лимита и лимита на чат. Ответы
+    RetryAfter обрабатываются повторной отправкой после паузы. Сообщения
+    одному пользователю, накопившиеся в очереди или внутри batch(),
+    объединяются в одну сводку.
+    """
+
+    def __init__(self, bot: Bot, global_rate: float = 25.0, chat_rate: float = 1.0,
+                 workers: int = 4, max_retries: int = 3):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.workers = workers
+        self.max_retries = max_retries
+        self._global_bucket = TokenBucket(global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._pending: Dict[int, List[str]] = {}
+        self._queued: Set[int] = set()
+        # Чаты, которым сейчас отправляется сообщение
+        self._sending: Set[int] = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._batch_depth = 0
+        self.sent = 0
+        self.failed = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Число пользователей, ожидающих отправки."""
+        return len(self._pending)
+
+    def send(self, chat_id: int, text: str) -> None:
+        """Постановка уведомления в очередь."""
+        self._pending.setdefault(chat_id, []).append(text)
+        if self._batch_depth == 0:
+            self._enqueue(chat_id)
+
+    def _enqueue(self, chat_id: int) -> None:
+        # Пока чату идет отправка, новые сообщения ждут ее завершения
+        if chat_id in self._queued or chat_id in self._sending:
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._queued.add(chat_id)
+        self._queue.put_nowait(chat_id)
+
+    @contextmanager
+    def batch(self):
+        """Накопление уведомлений (например, за проход проверки) в сводки."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                for chat_id in list(self._pending):
+                    self._enqueue(chat_id)
+
+    async def start(self) -> None:
+        """Запуск воркеров отправки."""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, capacity=1)
+        return bucket
+
+    @staticmethod
+    def build_digest(texts: List[str]) -> str:
+        """Объединение нескольких уведомлений в одно сообщение."""
+        if len(texts) == 1:
+            return texts[0]
+        return f"🔔 Изменения цен ({len(texts)}):\n\n" + "\n\n".join(texts)
+
+    async def _deliver(self, chat_id: int, text: str) -> bool:
+        """Отправка одного сообщения с повтором после RetryAfter."""
+        chat_bucket = self._chat_bucket(chat_id)
+        for _ in range(self.max_retries + 1):
+            # Токен чата берется после паузы общего лимита, иначе после
+            # RetryAfter сообщения в чат уйдут чаще chat_rate
+            await self._global_bucket.wait()
+            await chat_bucket.acquire()
+            await self._global_bucket.acquire()
+            try:
+                with NOTIFY_SECONDS.time():
+                    await self.bot.send_message(chat_id, text)
+                return True
+            except TelegramRetryAfter as e:
+                logger.warning(f"Превышен лимит Telegram, повтор через {e.retry_after} с")
+                # Флуд-контроль Telegram общий для бота: приостанавливаем все отправки
+                self._global_bucket.pause(e.retry_after)
+            except TelegramAPIError as e:
+                logger.error(f"Ошибка отправки уведомления пользователю {chat_id}: {e}")
+                return False
+        logger.error(f"Уведомление пользователю {chat_id} не отправлено после {self.max_retries} повторов")
+        return False
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id = await self._queue.get()
+            self._queued.discard(chat_id)
+            self._sending.add(chat_id)
+            try:
+                texts = self._pending.pop(chat_id, [])
+                if not texts:
+                    continue
+                for part in split_message(self.build_digest(texts)):
+                    if await self._deliver(chat_id, part):
+                        self.sent += 1
+                        NOTIFICATIONS_TOTAL.inc(result='sent')
+                    else:
+                        self.failed += 1
+                        NOTIFICATIONS_TOTAL.inc(result='failed')
+                logger.info(f"Уведомление отправлено пользователю {chat_id} ({len(texts)} изменений)")
+            except Exception as e:
+                logger.error(f"Ошибка в очереди уведомлений: {e}")
+            finally:
+                self._sending.discard(chat_id)
+                # Сообщения, пришедшие во время отправки, уходят следующей сводкой
+                if chat_id in self._pending and self._batch_depth == 0:
+                    self._enqueue(chat_id)
+                self._queue.task_done()
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Отправка оставшихся уведомлений и остановка воркеров."""
+        if self._queue is not None and self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Не отправлены уведомления для {self.queue_depth} пользователей")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from extractor import create_extractor
+from metrics import PARSE_SECONDS
+
+logger = logging.getLogger('bot')
+
+# Извлекатели, созданные в рабочем процессе или потоке
+_extractors: Dict[str, object] = {}
+
+
+def _extract(extractor_name: str, body: bytes, encoding: str) -> Optional[Dict]:
+    """Извлечение данных о товаре внутри пула (должна быть picklable)."""
+    extractor = _extractors.get(extractor_name)
+    if extractor is None:
+        extractor = _extractors[extractor_name] = create_extractor(extractor_name)
+    return extractor.extract(body, encoding)
+
+
+class ParserPool:
+    """Пул потоков или процессов для разбора страниц вне цикла событий.
+
+    Число одновременно разбираемых и ожидающих разбора страниц ограничено
+    queue_depth: загрузчик занимает слот через slot() до чтения тела ответа
+    и при заполненной очереди ждет, а не накапливает страницы в памяти.
+    """
+
+    def __init__(self, extractor_name: str, kind: str = 'thread', workers: int = 2, queue_depth: int = 8):
+        self.extractor_name = extractor_name
+        self.kind = kind
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor: Optional[Executor] = None
+        self._slots = asyncio.Semaphore(queue_depth)
+        self.pending = 0
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.kind == 'none':
+            return None
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='parser')
+            logger.info(f"Запущен пул разбора страниц: {self.kind}, воркеров: {self.workers}")
+        return self._executor
+
+    def slot(self) -> asyncio.Semaphore:
+        """Слот очереди разбора (использовать как async with)."""
+        return self._slots
+
+    async def extract(self, body: bytes, encoding: str = 'utf-8') -> Optional[Dict]:
+        """Извлечение названия и цены товара в пуле."""
+        executor = self._get_executor()
+        with PARSE_SECONDS.time():
+            if executor is None:
+                return _extract(self.extractor_name, body, encoding)
+            self.pending += 1
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(executor, _extract, self.extractor_name, body, encoding)
+            finally:
+                self.pending -= 1
+
+    def shutdown(self) -> None:
+        """Остановка пула."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Пул разбора страниц остановлен")
@@ -0,0 +1,218 @@
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger('bot')
+
+# Этапы проверки товара в порядке выполнения
+STAGES = ('fetch', 'extract', 'compare', 'persist', 'notify')
+# Дополнительные форматы отчета
+OUTPUT_CPROFILE = 'cprofile'
+OUTPUT_FOLDED = 'folded'
+OUTPUTS = (OUTPUT_CPROFILE, OUTPUT_FOLDED)
+
+
+class _Frame:
+    """Открытый интервал: имя и время, уже учтенное во вложенных интервалах."""
+
+    __slots__ = ('name', 'child_time')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.child_time = 0.0
+
+
+# Профилируемый проход, стек открытых интервалов и товар текущей задачи.
+# Задачи, запущенные внутри прохода, наследуют их, остальные задачи
+# (например, плановые проверки в режиме rolling) в отчет не попадают
+_session: ContextVar[Optional['ProfileSession']] = ContextVar('profile_session', default=None)
+_stack: ContextVar[Tuple[_Frame, ...]] = ContextVar('profile_stack', default=())
+_trace_key: ContextVar[Optional[str]] = ContextVar('profile_trace', default=None)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class ProfileSession:
+    """Данные профилирования одного прохода проверки."""
+
+    def __init__(self, cprofile: bool = False):
+        self.started_at = time.perf_counter()
+        self.duration = 0.0
+        # Длительности по этапам, по товарам и собственное время по стекам
+        self.stages: Dict[str, List[float]] = {}
+        self.traces: Dict[str, Dict[str, float]] = {}
+        self.folded: Dict[str, float] = {}
+        self.loop_lag: List[float] = []
+        self.profile = cProfile.Profile() if cprofile else None
+
+    def add(self, path: Tuple[str, ...], seconds: float, self_seconds: float) -> None:
+        stage = path[-1]
+        self.stages.setdefault(stage, []).append(seconds)
+        key = _trace_key.get()
+        if key is not None:
+            trace = self.traces.setdefault(key, {})
+            trace[stage] = trace.get(stage, 0.0) + seconds
+        stack = ';'.join(path)
+        self.folded[stack] = self.folded.get(stack, 0.0) + max(0.0, self_seconds)
+
+    def summary(self, top: int = 10) -> str:
+        """Текстовый отчет: этапы, самые медленные товары и задержка цикла событий."""
+        lines = [f"Профиль проверки цен: {self.duration:.2f} с, товаров {len(self.traces)}"]
+        lines.append("Этапы (число, всего, среднее, p95, максимум, с):")
+        for stage in sorted(self.stages, key=lambda stage: -sum(self.stages[stage])):
+            values = self.stages[stage]
+            lines.append(
+                f"  {stage:<10} {len(values):>6} {sum(values):>9.3f} {sum(values) / len(values):>8.4f} "
+                f"{_percentile(values, 0.95):>8.4f} {max(values):>8.4f}"
+            )
+        if self.traces:
+            lines.append(f"Самые медленные товары (до {top}):")
+            slowest = sorted(self.traces.items(), key=lambda item: -item[1].get('product', 0.0))[:top]
+            for key, trace in slowest:
+                stages = ", ".join(f"{stage} {trace[stage]:.3f}" for stage in STAGES if stage in trace)
+                lines.append(f"  {trace.get('product', 0.0):.3f} с {key} ({stages})")
+        if self.loop_lag:
+            lines.append(
+                f"Задержка цикла событий: замеров {len(self.loop_lag)}, "
+                f"среднее {sum(self.loop_lag) / len(self.loop_lag) * 1000:.1f} мс, "
+                f"p95 {_percentile(self.loop_lag, 0.95) * 1000:.1f} мс, "
+                f"максимум {max(self.loop_lag) * 1000:.1f} мс"
+            )
+        if self.profile is not None:
+            stream = io.StringIO()
+            pstats.Stats(self.profile, stream=stream).sort_stats('cumulative').print_stats(top)
+            lines.append(stream.getvalue().rstrip())
+        return '\n'.join(lines)
+
+    def folded_stacks(self) -> str:
+        """Собственное время стеков в микросекундах в формате flamegraph.pl/speedscope."""
+        return ''.join(
+            f"{stack} {round(seconds * 1_000_000)}\n"
+            for stack, seconds in sorted(self.folded.items())
+            if seconds > 0
+        )
+
+
+class SweepProfiler:
+    """Профилирование проходов проверки цен по требованию.
+
+    Пока профилирование выключено, span() ничего не замеряет. В задачах
+    профилируемого прохода span() записывает длительность этапа для
+    текущего товара, фоновая задача замеряет задержку цикла событий, а
+    после прохода отчет пишется в журнал и в output_dir вместе с
+    необязательными профилем cProfile (.prof) и стеками для flamegraph
+    (.folded).
+    """
+
+    def __init__(self, enabled: bool = False, outputs: Iterable[str] = (), output_dir: str = 'profiles',
+                 lag_interval: float = 0.05, top: int = 10):
+        self.enabled = enabled
+        self.outputs = tuple(outputs)
+        self.output_dir = output_dir
+        self.lag_interval = lag_interval
+        self.top = top
+        self.session: Optional[ProfileSession] = None
+        self.last_report: Optional[str] = None
+
+    @contextmanager
+    def span(self, stage: str, key: Optional[str] = None):
+        """Замер этапа; key задает товар, к которому относятся вложенные этапы."""
+        session = _session.get()
+        if session is None:
+            yield
+            return
+        frame = _Frame(stage)
+        parents = _stack.get()
+        stack_token = _stack.set(parents + (frame,))
+        key_token = _trace_key.set(key) if key is not None else None
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            session.add(tuple(parent.name for parent in parents) + (stage,), elapsed, elapsed - frame.child_time)
+            if key_token is not None:
+                _trace_key.reset(key_token)
+            _stack.reset(stack_token)
+            if parents:
+                parents[-1].child_time += elapsed
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Учет этапа, длительность которого измерена по частям."""
+        session = _session.get()
+        if session is None:
+            return
+        parents = _stack.get()
+        session.add(tuple(parent.name for parent in parents) + (stage,), seconds, seconds)
+        if parents:
+            parents[-1].child_time += seconds
+
+    async def _sample_loop_lag(self, session: ProfileSession) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            session.loop_lag.append(max(0.0, loop.time() - expected))
+
+    @asynccontextmanager
+    async def profile_sweep(self):
+        """Профилирование прохода, если оно включено."""
+        if not self.enabled or self.session is not None:
+            yield None
+            return
+        session = ProfileSession(cprofile=OUTPUT_CPROFILE in self.outputs)
+        sampler = asyncio.create_task(self._sample_loop_lag(session))
+        self.session = session
+        session_token = _session.set(session)
+        if session.profile is not None:
+            session.profile.enable()
+        try:
+            with self.span('sweep'):
+                yield session
+        finally:
+            if session.profile is not None:
+                session.profile.disable()
+            _session.reset(session_token)
+            self.session = None
+            sampler.cancel()
+            await asyncio.gather(sampler, return_exceptions=True)
+            session.duration = time.perf_counter() - session.started_at
+            await self._report(session)
+
+    async def _report(self, session: ProfileSession) -> None:
+        try:
+            report = session.summary(self.top)
+            self.last_report = report
+            logger.info(report)
+            paths = await asyncio.to_thread(self._dump, session, report)
+            logger.info(f"Профиль проверки цен сохранен: {', '.join(paths)}")
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении профиля проверки цен: {e}")
+
+    def _dump(self, session: ProfileSession, report: str) -> List[str]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"sweep-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+        paths = [f"{base}.txt"]
+        with open(paths[0], 'w', encoding='utf-8') as file:
+            file.write(report + '\n')
+        if session.profile is not None:
+            paths.append(f"{base}.prof")
+            session.profile.dump_stats(paths[-1])
+        if OUTPUT_FOLDED in self.outputs:
+            paths.append(f"{base}.folded")
+            with open(paths[-1], 'w', encoding='utf-8') as file:
+                file.write(session.folded_stacks())
+        return paths
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import nullcontext
+from typing import AsyncContextManager, Awaitable, Callable, Dict, Optional, TypeVar
+from urllib.parse import urlsplit
+
+from metrics import FETCH_FAILURES_TOTAL, FETCH_SECONDS
+
+logger = logging.getLogger('bot')
+
+T = TypeVar('T')
+
+# Классы ошибок загрузки страницы
+CAPTCHA = 'captcha'
+RATE_LIMIT = 'rate_limit'
+NETWORK = 'network'
+PARSE = 'parse'
+HTTP = 'http'
+FAILURE_KINDS = (CAPTCHA, RATE_LIMIT, NETWORK, PARSE, HTTP)
+
+# Ошибки, означающие, что Яндекс.Маркет ограничивает запросы
+THROTTLE_KINDS = (CAPTCHA, RATE_LIMIT)
+# Ошибки, которые имеет смысл повторить
+RETRYABLE_KINDS = (RATE_LIMIT, NETWORK)
+
+# Признаки страницы с капчей вместо карточки товара
+CAPTCHA_RE = re.compile(rb'showcaptcha|smartcaptcha|checkcaptcha', re.IGNORECASE)
+
+
+def is_captcha_page(body: bytes) -> bool:
+    """Проверка, что вместо страницы товара пришла капча."""
+    return CAPTCHA_RE.search(body) is not None
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Значение заголовка Retry-After в секундах."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        # Дата в формате HTTP не используется Яндекс.Маркетом, игнорируем
+        return None
+
+
+class FetchError(Exception):
+    """Классифицированная ошибка загрузки страницы товара."""
+
+    def __init__(self, kind: str, message: str, retry_after: Optional[float] = None,
+                 retryable: Optional[bool] = None):
+        super().__init__(message)
+        self.kind = kind
+        self.retry_after = retry_after
+        self.retryable = kind in RETRYABLE_KINDS if retryable is None else retryable
+
+
+class _HostState:
+    __slots__ = ('failures', 'open_until', 'reset_timeout', 'probing', 'probe_finished')
+
+    def __init__(self, reset_timeout: float):
+        self.failures = 0
+        self.open_until = 0.0
+        self.reset_timeout = reset_timeout
+        self.probing = False
+        self.probe_finished = asyncio.Event()
+
+
+class CircuitBreaker:
+    """Автоматический выключатель запросов к хосту.
+
+    После failure_threshold подряд ответов с капчей или 429 хост
+    «размыкается»: все запросы к нему ждут reset_timeout секунд (или
+    Retry-After, если он больше), что приостанавливает обход. Затем
+    проходит один пробный запрос: при успехе выключатель замыкается, при
+    новой ошибке размыкается снова с удвоенным таймаутом (до max_reset_timeout).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0, max_reset_timeout: float = 900.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max(max_reset_timeout, reset_timeout)
+        self._states: Dict[str, _HostState] = {}
+        self.trips = 0
+
+    def _state(self, host: str) -> _HostState:
+        state = self._states.get(host)
+        if state is None:
+            state = self._states[host] = _HostState(self.reset_timeout)
+        return state
+
+    def is_open(self, host: str) -> bool:
+        """Запросы к хосту сейчас приостановлены."""
+        state = self._states.get(host)
+        return state is not None and (state.open_until > time.monotonic() or state.probing)
+
+    async def acquire(self, host: str) -> bool:
+        """Ожидание, пока к хосту можно обращаться.
+
+        Возвращает True для пробного запроса: после него нужно вызвать release().
+        """
+        state = self._state(host)
+        while True:
+            now = time.monotonic()
+            if state.open_until > now:
+                await asyncio.sleep(state.open_until - now)
+                continue
+            if state.probing:
+                await state.probe_finished.wait()
+                continue
+            if state.open_until:
+                # Таймаут истек: этот запрос пробный, остальные ждут его результата
+                state.probing = True
+                state.probe_finished.clear()
+                return True
+            return False
+
+    def release(self, host: str) -> None:
+        """Завершение пробного запроса."""
+        state = self._states.get(host)
+        if state is not None and state.probing:
+            state.probing = False
+            state.probe_finished.set()
+
+    def record_success(self, host: str) -> None:
+        state = self._state(host)
+        state.failures = 0
+        if state.open_until:
+            logger.info(f"Запросы к {host} возобновлены")
+        state.open_until = 0.0
+        state.reset_timeout = self.reset_timeout
+
+    def record_failure(self, host: str, throttled: bool, retry_after: Optional[float] = None) -> None:
+        state = self._state(host)
+        if throttled:
+            state.failures += 1
+            if state.probing or state.failures >= self.failure_threshold:
+                timeout = max(state.reset_timeout, retry_after or 0.0)
+                state.open_until = time.monotonic() + timeout
+                state.reset_timeout = min(self.max_reset_timeout, state.reset_timeout * 2)
+                state.failures = 0
+                self.trips += 1
+                logger.warning(f"Яндекс.Маркет ограничивает запросы: обращения к {host} приостановлены на {timeout:.0f} с")
+
+
+class ResilientFetcher:
+    """Повтор загрузок с экспоненциальной задержкой и учетом ошибок по классам.
+
+    Повторяются только сетевые ошибки, 429 и ответы 5xx. Задержка
+    выбирается случайно в пределах base_delay * 2^попытка (не больше
+    max_delay) и не меньше Retry-After.
+    """
+
+    def __init__(self, breaker: CircuitBreaker, max_retries: int = 2,
+                 base_delay: float = 1.0, max_delay: float = 30.0):
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failures: Counter = Counter({kind: 0 for kind in FAILURE_KINDS})
+        self.retries = 0
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    async def call(self, url: str, fetch: Callable[[], Awaitable[T]], retry: bool = True,
+                   limit: Optional[Callable[[str], AsyncContextManager]] = None) -> T:
+        """Выполнение fetch с повторами.
+
+        При retry=False выполняется одна попытка, а если запросы к хосту
+        приостановлены, ошибка возвращается сразу, без ожидания. limit(url)
+        занимает слот параллельности только на время попытки: во время
+        задержки между попытками слот свободен для других запросов.
+        """
+        host = urlsplit(url).hostname or ''
+        attempts = self.max_retries + 1 if retry else 1
+        for attempt in range(attempts):
+            if not retry and self.breaker.is_open(host):
+                self.failures[RATE_LIMIT] += 1
+                FETCH_FAILURES_TOTAL.inc(kind=RATE_LIMIT)
+                raise FetchError(RATE_LIMIT, "Запросы к Яндекс.Маркету временно приостановлены")
+            probe = await self.breaker.acquire(host)
+            try:
+                async with limit(url) if limit is not None else nullcontext():
+                    started = time.perf_counter()
+                    result = await fetch()
+            except FetchError as e:
+                FETCH_SECONDS.observe(time.perf_counter() - started, outcome=e.kind)
+                FETCH_FAILURES_TOTAL.inc(kind=e.kind)
+                self.failures[e.kind] += 1
+                self.breaker.record_failure(host, e.kind in THROTTLE_KINDS, e.retry_after)
+                if not e.retryable or attempt == attempts - 1:
+                    raise
+                error = e
+                delay = self.backoff(attempt, e.retry_after)
+            else:
+                FETCH_SECONDS.observe(time.perf_counter() - started, outcome='ok')
+                self.breaker.record_success(host)
+                return result
+            finally:
+                if probe:
+                    self.breaker.release(host)
+            self.retries += 1
+            logger.warning(f"Повтор запроса к {url} через {delay:.1f} с ({error.kind}: {error})")
+            await asyncio.sleep(delay)
+
+    def __str__(self) -> str:
+        failures = ", ".join(f"{kind} {count}" for kind, count in self.failures.items())
+        return f"ошибки загрузки: {failures}; повторов {self.retries}, приостановок {self.breaker.trips}"
@@ -0,0 +1,373 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from database import TIMESTAMP_FORMAT
+from ratelimit import TokenBucket
+from models import Product
+from sweep import SweepEngine, SweepStats
+
+logger = logging.getLogger('bot')
+
+# Изменение цены на такую долю порога и больше переводит товар на минимальный интервал
+VOLATILE_THRESHOLD_SHARE = 0.5
+# Во сколько раз увеличивается интервал стабильного товара
+BACKOFF_FACTOR = 1.5
+# Период вывода статистики планировщика в лог, секунд
+REPORT_INTERVAL = 300
+# Идентификатор задачи полной проверки в APScheduler
+SWEEP_JOB_ID = 'check_prices'
+
+
+class ScheduleEntry:
+    """Состояние проверки одной страницы товара."""
+
+    __slots__ = ('key', 'products', 'interval', 'next_due', 'last_price', 'in_flight')
+
+    def __init__(self, key: str, products: List[Product], interval: float, next_due: float):
+        self.key = key
+        self.products = products
+        self.interval = interval
+        self.next_due = next_due
+        self.last_price: Optional[int] = None
+        self.in_flight = False
+
+    @property
+    def url(self) -> str:
+        return self.products[0].url
+
+
+class AdaptiveScheduler:
+    """Планировщик проверок с собственным сроком для каждой страницы.
+
+    Сроки хранятся в куче. Новые страницы равномерно распределяются по
+    интервалу, а к каждому следующему сроку добавляется случайный сдвиг
+    (jitter), поэтому проверки идут ровным потоком, а не пачкой раз в
+    интервал. В адаптивном режиме страница, цена которой изменилась,
+    проверяется чаще (вплоть до min_interval), стабильная - реже (до
+    max_interval). Общий темп запросов ограничен requests_per_minute.
+    """
+
+    def __init__(
+        self,
+        engine: SweepEngine,
+        base_interval: float,
+        min_interval: float,
+        max_interval: float,
+        requests_per_minute: float,
+        adaptive: bool = True,
+        jitter: float = 0.1,
+        refresh_interval: float = 30.0,
+    ):
+        self.engine = engine
+        self.adaptive = adaptive
+        self.jitter = jitter
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.refresh_interval = refresh_interval
+        self._budget = TokenBucket(requests_per_minute / 60, capacity=max(1.0, requests_per_minute / 60))
+        self._entries: Dict[str, ScheduleEntry] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = 0
+        self._tasks: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self.checks = 0
+        self.failures = 0
+
+    def _push(self, entry: ScheduleEntry) -> None:
+        self._seq += 1
+        heapq.heappush(self._heap, (entry.next_due, self._seq, entry.key))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _jittered(self, interval: float) -> float:
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def update_products(self, groups: Dict[str, List[Product]]) -> None:
+        """Синхронизация расписания с актуальным списком подписок.
+
+        Новые страницы, которые не проверялись дольше базового интервала (или
+        не проверялись вовсе), получают сроки, равномерно распределенные по
+        интервалу в порядке давности проверки. Недавно проверенные страницы
+        становятся в очередь через интервал после последней проверки. Сроки
+        получают небольшой случайный сдвиг.
+        """
+        now = time.monotonic()
+        stale_keys = []
+        for key, products in groups.items():
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.products = products
+                continue
+            age = self._checked_age(products)
+            if age is None or age >= self.base_interval:
+                stale_keys.append(key)
+            else:
+                self._add_entry(key, products, now + self._jittered(self.base_interval - age))
+        slot = self.base_interval / max(len(stale_keys), 1)
+        for index, key in enumerate(stale_keys):
+            offset = slot * index + random.uniform(0, slot * self.jitter)
+            self._add_entry(key, groups[key], now + offset)
+        for key in set(self._entries) - set(groups):
+            # Из кучи запись удаляется лениво при извлечении
+            del self._entries[key]
+
+    def _add_entry(self, key: str, products: List[Product], next_due: float) -> None:
+        entry = self._entries[key] = ScheduleEntry(key, products, self.base_interval, next_due)
+        entry.last_price = products[0].last_price
+        self._push(entry)
+
+    @staticmethod
+    def _checked_age(products: List[Product]) -> Optional[float]:
+        """Секунды с самой давней проверки подписок страницы (None, если не проверялась)."""
+        checked = [product.checked_at for product in products]
+        if None in checked:
+            return None
+        oldest = datetime.strptime(min(checked), TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+        return max(0.0, (datetime.now(timezone.utc) - oldest).total_seconds())
+
+    def set_base_interval(self, base_interval: float) -> None:
+        """Смена базового интервала без перезапуска.
+
+        Оставшееся до проверки время каждой страницы масштабируется в том же
+        отношении, поэтому равномерное распределение сроков сохраняется.
+        """
+        ratio = base_interval / self.base_interval
+        self.base_interval = base_interval
+        self.min_interval = min(self.min_interval, base_interval)
+        self.max_interval = max(self.max_interval, base_interval)
+        now = time.monotonic()
+        for entry in self._entries.values():
+            if self.adaptive:
+                entry.interval = min(self.max_interval, max(self.min_interval, entry.interval * ratio))
+            else:
+                entry.interval = base_interval
+            if entry.in_flight:
+                # Следующий срок будет назначен по новому интервалу после проверки
+                continue
+            entry.next_due = now + max(0.0, entry.next_due - now) * ratio
+            self._push(entry)
+
+    def pop_due(self, now: float) -> Optional[ScheduleEntry]:
+        """Извлечение страницы, срок проверки которой наступил."""
+        while self._heap and self._heap[0][0] <= now:
+            due, _, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is not None and entry.next_due == due and not entry.in_flight:
+                return entry
+        return None
+
+    def seconds_until_next(self, now: float) -> Optional[float]:
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - now)
+
+    def record_result(self, entry: ScheduleEntry, product_info: Optional[Dict]) -> None:
+        """Подстройка интервала по результату проверки и планирование следующей."""
+        if product_info is not None and self.adaptive:
+            price = product_info['price']
+            if entry.last_price is not None and price != entry.last_price:
+                change = abs(price - entry.last_price)
+                min_threshold = min(product.threshold for product in entry.products)
+                if change >= min_threshold * VOLATILE_THRESHOLD_SHARE:
+                    entry.interval = self.min_interval
+                else:
+                    entry.interval = max(self.min_interval, entry.interval / 2)
+            elif entry.last_price is not None:
+                entry.interval = min(self.max_interval, entry.interval * BACKOFF_FACTOR)
+            entry.last_price = price
+        entry.next_due = time.monotonic() + self._jittered(entry.interval)
+        if entry.key in self._entries:
+            self._push(entry)
+
+    async def _check(self, entry: ScheduleEntry, check_group: Callable[[List[Product]], Awaitable[Optional[Dict]]]) -> None:
+        product_info = None
+        try:
+            async with self.engine.worker_limit(entry.url):
+                product_info = await check_group(entry.products)
+        except Exception as e:
+            logger.error(f"Ошибка при плановой проверке {entry.url}: {e}")
+        finally:
+            entry.in_flight = False
+            self.checks += 1
+            if product_info is None:
+                self.failures += 1
+            self.record_result(entry, product_info)
+
+    async def run(
+        self,
+        load_groups: Callable[[], Awaitable[Dict[str, List[Product]]]],
+        check_group: Callable[[List[Product]], Awaitable[Optional[Dict]]],
+    ) -> None:
+        """Непрерывный цикл проверок до отмены задачи."""
+        if self.adaptive:
+            logger.info(
+                f"Адаптивный планировщик запущен: интервал {self.min_interval / 60:.0f}-"
+                f"{self.max_interval / 60:.0f} мин"
+            )
+        else:
+            logger.info(f"Равномерный планировщик запущен: интервал {self.base_interval / 60:.0f} мин")
+        self._wakeup = asyncio.Event()
+        next_refresh = 0.0
+        next_report = time.monotonic() + REPORT_INTERVAL
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= next_refresh:
+                    self.update_products(await load_groups())
+                    next_refresh = now + self.refresh_interval
+                if now >= next_report:
+                    next_report = now + REPORT_INTERVAL
+                    logger.info(
+                        f"Планировщик: страниц {len(self._entries)}, проверок {self.checks}, "
+                        f"ошибок {self.failures}"
+                    )
+                entry = self.pop_due(now)
+                if entry is None:
+                    wait = self.seconds_until_next(now)
+                    wait = self.refresh_interval if wait is None else wait
+                    # Ждем срока ближайшей проверки или появления новой записи в куче
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), min(wait, max(0.0, next_refresh - now)))
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._budget.acquire()
+                entry.in_flight = True
+                task = asyncio.create_task(self._check(entry, check_group))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+
+
+class CheckScheduler:
+    """Управление плановыми проверками цен.
+
+    В режиме sweep полная проверка запускается задачей APScheduler, в
+    режимах rolling и adaptive страницы проверяет AdaptiveScheduler.
+    Интервал можно сменить на лету через set_interval(). Полные проверки
+    не пересекаются: пока идет одна, следующая пропускается.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        engine: SweepEngine,
+        min_interval: float,
+        max_interval: float,
+        requests_per_minute: float,
+        jitter: float = 0.1,
+    ):
+        self.mode = mode
+        self.engine = engine
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.requests_per_minute = requests_per_minute
+        self.jitter = jitter
+        self.interval: Optional[int] = None
+        self.scheduler = AsyncIOScheduler()
+        self.rolling: Optional[AdaptiveScheduler] = None
+        self._rolling_task: Optional[asyncio.Task] = None
+        self._sweep: Optional[Callable[[Optional[SweepStats]], Awaitable[object]]] = None
+        self._sweep_lock = asyncio.Lock()
+        self._sweep_task: Optional[asyncio.Task] = None
+
+    @property
+    def sweep_running(self) -> bool:
+        return self._sweep_lock.locked() or (self._sweep_task is not None and not self._sweep_task.done())
+
+    async def run_sweep(self, stats: Optional[SweepStats] = None) -> bool:
+        """Полная проверка всех товаров, если другая еще не идет.
+
+        Возвращает False, если проверка пропущена.
+        """
+        if self._sweep_lock.locked():
+            logger.warning("Предыдущая проверка цен еще не завершена, новая пропущена")
+            return False
+        async with self._sweep_lock:
+            await self._sweep(stats)
+        return True
+
+    def start_background_sweep(self, stats: Optional[SweepStats] = None) -> Optional[asyncio.Task]:
+        """Запуск полной проверки фоновой задачей.
+
+        Возвращает None, если проверка уже идет.
+        """
+        if self.sweep_running:
+            return None
+        self._sweep_task = asyncio.create_task(self.run_sweep(stats))
+        return self._sweep_task
+
+    def cancel_sweep(self) -> bool:
+        """Отмена фоновой проверки, запущенной через start_background_sweep()."""
+        if self._sweep_task is None or self._sweep_task.done():
+            return False
+        self._sweep_task.cancel()
+        return True
+
+    def start(
+        self,
+        interval: int,
+        sweep: Callable[[Optional[SweepStats]], Awaitable[object]],
+        load_groups: Callable[[], Awaitable[Dict[str, List[Product]]]],
+        check_group: Callable[[List[Product]], Awaitable[Optional[Dict]]],
+    ) -> None:
+        """Запуск плановых проверок с интервалом interval минут."""
+        self.interval = interval
+        self._sweep = sweep
+        if self.mode == 'sweep':
+            self.scheduler.add_job(
+                self.run_sweep, 'interval', minutes=interval, id=SWEEP_JOB_ID,
+                max_instances=1, coalesce=True, replace_existing=True
+            )
+        else:
+            self.rolling = AdaptiveScheduler(
+                self.engine,
+                base_interval=interval * 60,
+                min_interval=self.min_interval * 60,
+                max_interval=self.max_interval * 60,
+                requests_per_minute=self.requests_per_minute,
+                adaptive=self.mode == 'adaptive',
+                jitter=self.jitter
+            )
+            self._rolling_task = asyncio.create_task(self.rolling.run(load_groups, check_group))
+        self.scheduler.start()
+
+    def add_periodic(self, func: Callable[[], Awaitable[None]], minutes: float, job_id: str) -> None:
+        """Периодическая служебная задача без наложения запусков."""
+        self.scheduler.add_job(
+            func, 'interval', minutes=minutes, id=job_id,
+            max_instances=1, coalesce=True, replace_existing=True
+        )
+
+    def set_interval(self, interval: int) -> None:
+        """Смена интервала проверки без перезапуска бота."""
+        if interval == self.interval:
+            return
+        self.interval = interval
+        if self.rolling is not None:
+            self.rolling.set_base_interval(interval * 60)
+        elif self.scheduler.get_job(SWEEP_JOB_ID) is not None:
+            self.scheduler.reschedule_job(SWEEP_JOB_ID, trigger='interval', minutes=interval)
+        logger.info(f"Интервал проверки цен изменен на {interval} мин")
+
+    async def shutdown(self) -> None:
+        """Остановка планировщика и фоновых проверок."""
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+        if self.cancel_sweep():
+            await asyncio.gather(self._sweep_task, return_exceptions=True)
+        if self._rolling_task is not None:
+            self._rolling_task.cancel()
+            await asyncio.gather(self._rolling_task, return_exceptions=True)
+            self._rolling_task = None
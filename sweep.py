@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, TypeVar
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger('bot')
+
+T = TypeVar('T')
+
+# Параметры запроса, которые не влияют на содержимое страницы товара
+TRACKING_PARAMS = {'clid', 'yclid', 'gclid', 'fbclid', '_openstat', 'track'}
+
+
+def normalize_url(url: str) -> str:
+    """Приведение URL товара к каноническому виду.
+
+    Ссылки, отличающиеся только регистром хоста, фрагментом, порядком
+    параметров или трекинговыми метками, указывают на одну страницу.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port:
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/') or '/'
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in TRACKING_PARAMS and not key.startswith('utm_')
+    )
+    return urlunsplit((parts.scheme.lower(), host, path, urlencode(query), ''))
+
+
+def group_by_url(items: Iterable[T], url_of: Callable[[T], str]) -> Dict[str, List[T]]:
+    """Группировка подписок по нормализованному URL."""
+    groups: Dict[str, List[T]] = {}
+    for item in items:
+        groups.setdefault(normalize_url(url_of(item)), []).append(item)
+    return groups
+
+
+class SweepStats:
+    """Статистика одного прохода проверки цен."""
+
+    def __init__(self, total: int = 0):
+        self.total = total
+        self.subscriptions = total
+        self.checked = 0
+        self.failed = 0
+        self.started_at = time.monotonic()
+        self.duration = 0.0
+
+    def finish(self) -> None:
+        self.duration = time.monotonic() - self.started_at
+
+    @property
+    def dedup_ratio(self) -> float:
+        """Сколько подписок в среднем обслуживает один запрос."""
+        return self.subscriptions / self.total if self.total else 1.0
+
+    def __str__(self) -> str:
+        return (
+            f"проверено {self.checked}/{self.total}, ошибок {self.failed}, "
+            f"подписок {self.subscriptions} (x{self.dedup_ratio:.2f}), "
+            f"длительность {self.duration:.1f} с"
+        )
+
+
+class SweepEngine:
+    """Параллельный обход товаров с глобальным лимитом и лимитом на хост.
+
+    Лимиты общие для всех проходов и для отдельных проверок через limit().
+    При limit_workers=False слот не занимается на все время worker: worker
+    сам занимает его через limit() только на время запросов и, например,
+    не держит его во время задержки перед повтором.
+    """
+
+    def __init__(self, max_concurrency: int, per_host_limit: int, limit_workers: bool = True):
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.limit_workers = limit_workers
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """Семафор для хоста, к которому относится URL."""
+        host = urlsplit(url).hostname or ''
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_limit)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def limit(self, url: str):
+        """Слот для одной проверки URL с учетом обоих лимитов."""
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._global_semaphore, self._host_semaphore(url):
+            yield
+
+    def worker_limit(self, url: str):
+        """Слот на все время worker или пустой контекст, если worker занимает слот сам."""
+        return self.limit(url) if self.limit_workers else nullcontext()
+
+    async def run(
+        self,
+        items: Iterable[T],
+        worker: Callable[[T], Awaitable[object]],
+        url_of: Callable[[T], str],
+        stats: Optional[SweepStats] = None,
+    ) -> SweepStats:
+        """Запуск worker для каждого элемента с учетом лимитов.
+
+        Ложное значение, возвращенное worker, считается неудачной проверкой.
+        Переданный stats обновляется по ходу обхода, по нему можно следить
+        за прогрессом.
+        """
+        items = list(items)
+        if stats is None:
+            stats = SweepStats(len(items))
+        else:
+            stats.total = len(items)
+
+        async def run_one(item: T) -> None:
+            async with self.worker_limit(url_of(item)):
+                try:
+                    ok = await worker(item)
+                except Exception as e:
+                    logger.error(f"Ошибка при обработке элемента обхода: {e}")
+                    ok = False
+            stats.checked += 1
+            if not ok:
+                stats.failed += 1
+
+        await asyncio.gather(*(run_one(item) for item in items))
+        stats.finish()
+        return stats
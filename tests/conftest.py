@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Модули бота лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py требует обязательные переменные окружения
+os.environ.setdefault("TOKEN", "123456:test")
+os.environ.setdefault("YA_COOKIE", "test")
@@ -0,0 +1,34 @@
+"""Совпадение быстрого извлечения с эталонным разбором BeautifulSoup на сохраненных страницах."""
+from pathlib import Path
+
+import pytest
+
+from extractor import FastExtractor, SoupExtractor, create_extractor
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PAGES = sorted(FIXTURES.glob("*.html"))
+
+
+@pytest.mark.parametrize("page", PAGES, ids=lambda page: page.name)
+def test_fast_extractor_matches_soup(page):
+    body = page.read_bytes()
+    assert create_extractor("fast").extract(body) == SoupExtractor().extract(body)
+
+
+@pytest.mark.parametrize("page", PAGES, ids=lambda page: page.name)
+def test_fast_path_never_disagrees_with_soup(page):
+    # Без запасного пути быстрый поиск либо совпадает с эталоном, либо ничего не находит
+    body = page.read_bytes()
+    result = FastExtractor().extract(body)
+    assert result is None or result == SoupExtractor().extract(body)
+
+
+def test_fixtures_cover_fast_path_and_fallback():
+    results = {page.name: (FastExtractor().extract(page.read_bytes()), SoupExtractor().extract(page.read_bytes()))
+               for page in PAGES}
+    assert results["product_simple.html"][0] == {"name": "Смартфон Apple iPhone 15 128 ГБ, черный", "price": 79990}
+    assert results["product_entities.html"][0] == {"name": "Наушники «Sony» WH-1000XM5 & чехол", "price": 29490}
+    # Маркер не распознан регулярным выражением: результат дает только полный разбор
+    assert results["product_attr_gt.html"] == (None, {"name": "Пылесос Dreame T20", "price": 15990})
+    assert results["no_markers.html"] == (None, None)
+    assert results["captcha.html"] == (None, None)
@@ -0,0 +1,44 @@
+"""Миграция схемы применяется целиком или не применяется совсем."""
+import sqlite3
+
+import pytest
+
+import database
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    instance = Database(str(tmp_path / "prices.db"))
+    yield instance
+    instance.close()
+
+
+def columns(db, table):
+    return [row[1] for row in db.conn.execute(f"PRAGMA table_info({table})")]
+
+
+def test_failed_migration_rolls_back_schema_and_version(db, monkeypatch):
+    version = db.get_schema_version()
+    broken = (version + 1, "Сломанная миграция", [
+        "ALTER TABLE prices ADD COLUMN probe INTEGER",
+        "SELECT * FROM no_such_table",
+    ])
+    monkeypatch.setattr(database, "MIGRATIONS", database.MIGRATIONS + [broken])
+
+    with pytest.raises(sqlite3.OperationalError):
+        db.migrate()
+
+    assert "probe" not in columns(db, "prices")
+    assert db.get_schema_version() == version
+
+
+def test_migration_applies_schema_and_version_together(db, monkeypatch):
+    version = db.get_schema_version()
+    added = (version + 1, "Новая колонка", ["ALTER TABLE prices ADD COLUMN probe INTEGER"])
+    monkeypatch.setattr(database, "MIGRATIONS", database.MIGRATIONS + [added])
+
+    db.migrate()
+
+    assert "probe" in columns(db, "prices")
+    assert db.get_schema_version() == version + 1
@@ -0,0 +1,45 @@
+"""Сжатие истории цен не меняет последнюю запись товара."""
+import pytest
+
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    instance = Database(str(tmp_path / "prices.db"))
+    yield instance
+    instance.close()
+
+
+def age_history(db, timestamp="2020-01-01 10:00:00"):
+    with db.conn:
+        db.conn.execute("UPDATE price_history SET timestamp = ?", (timestamp,))
+
+
+def test_compaction_keeps_latest_raw_row_per_product(db):
+    product_id = db.add_product(1, "https://market.yandex.ru/product/1", "Товар", 1000)
+    db.update_price(product_id, 900)
+    db.update_price(product_id, 950)
+    last_id = db.get_last_history_id(product_id)
+    age_history(db)
+
+    assert db.compact_price_history()
+
+    remaining = db.conn.execute(
+        "SELECT id FROM price_history WHERE product_id = ?", (product_id,)
+    ).fetchall()
+    assert remaining == [(last_id,)]
+    assert db.get_last_history_id(product_id) == last_id
+    assert db.has_price_history(product_id)
+
+
+def test_compaction_keeps_last_id_monotonic(db):
+    product_id = db.add_product(1, "https://market.yandex.ru/product/1", "Товар", 1000)
+    db.update_price(product_id, 900)
+    age_history(db)
+    db.compact_price_history()
+    before = db.get_last_history_id(product_id)
+
+    db.update_price(product_id, 800)
+
+    assert db.get_last_history_id(product_id) > before
@@ -0,0 +1,46 @@
+"""Запросы к товарам и истории цен должны использовать индексы, а не полный просмотр таблиц."""
+import pytest
+
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "prices.db"))
+    product_id = database.add_product(1, "https://market.yandex.ru/product/1", "Товар", 1000)
+    database.update_price(product_id, 900)
+    yield database
+    database.close()
+
+
+def query_plans(db, call):
+    """Планы всех запросов, выполненных при вызове call()."""
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        db.conn.set_trace_callback(None)
+    selects = [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+    assert selects, "метод не выполнил ни одного запроса SELECT"
+    return [
+        " ".join(row[-1] for row in db.conn.execute("EXPLAIN QUERY PLAN " + sql))
+        for sql in selects
+    ]
+
+
+def test_user_products_use_user_index(db):
+    plans = query_plans(db, lambda: db.get_user_products(1))
+    assert any("USING INDEX idx_prices_user_id" in plan for plan in plans), plans
+
+
+def test_price_history_uses_product_timestamp_index(db):
+    plans = query_plans(db, lambda: db.get_price_history(1, hours=24))
+    assert all("idx_price_history_product_ts" in plan for plan in plans), plans
+    assert not any("USE TEMP B-TREE FOR ORDER BY" in plan for plan in plans), plans
+
+
+def test_has_price_history_uses_product_timestamp_index(db):
+    plans = query_plans(db, lambda: db.has_price_history(1))
+    assert all("idx_price_history_product_ts" in plan for plan in plans), plans
+    assert not any(plan.startswith("SCAN price_history") for plan in plans), plans
@@ -0,0 +1,38 @@
+"""Повтор загрузки не держит слот параллельности во время задержки."""
+import asyncio
+import time
+
+from resilience import NETWORK, CircuitBreaker, FetchError, ResilientFetcher
+from sweep import SweepEngine
+
+
+def test_backoff_releases_concurrency_slot():
+    engine = SweepEngine(max_concurrency=1, per_host_limit=1, limit_workers=False)
+    fetcher = ResilientFetcher(CircuitBreaker(), max_retries=1, base_delay=0.0)
+    finished = {}
+
+    async def worker(url):
+        attempts = []
+
+        async def fetch():
+            attempts.append(url)
+            if url.endswith("/1") and len(attempts) == 1:
+                raise FetchError(NETWORK, "обрыв соединения", retry_after=0.5)
+            return url
+
+        result = await fetcher.call(url, fetch, limit=engine.limit)
+        finished[url] = time.perf_counter()
+        return result
+
+    async def main():
+        started = time.perf_counter()
+        urls = ["https://market.yandex.ru/product/1", "https://market.yandex.ru/product/2"]
+        stats = await engine.run(urls, worker, url_of=lambda url: url)
+        return started, stats
+
+    started, stats = asyncio.run(main())
+
+    assert stats.failed == 0
+    # Второй товар проверен, пока первый ждал повтора, а не после него
+    assert finished["https://market.yandex.ru/product/2"] - started < 0.25
+    assert finished["https://market.yandex.ru/product/1"] - started >= 0.5
@@ -0,0 +1,87 @@
+"""Потоковая загрузка страницы: сколько байт действительно прочитано с локального сервера."""
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+FIXTURES = Path(__file__).parent / "fixtures"
+# Разметка похожих товаров после карточки: страница размером около 2 МБ
+FILLER = '<div data-zone-name="snippet"><a href="/product/1"><span>Похожий товар</span></a></div>\n'.encode()
+PAGE_SIZE = 2 * 1024 * 1024
+CHUNK_SIZE = 16 * 1024
+
+
+def padded(name: str) -> bytes:
+    body = (FIXTURES / name).read_bytes()
+    marker = body.rfind(b"<footer")
+    return body[:marker] + FILLER * (PAGE_SIZE // len(FILLER)) + body[marker:]
+
+
+@pytest.fixture(scope="module")
+def bot_module(tmp_path_factory):
+    # bot.py при импорте создает файлы журналов в текущем каталоге
+    cwd = Path.cwd()
+    log_dir = tmp_path_factory.mktemp("logs")
+    try:
+        os.chdir(log_dir)
+        import bot
+    finally:
+        os.chdir(cwd)
+    yield bot
+    bot.parser_pool.shutdown()
+
+
+async def serve(bot, page: bytes, sent: list):
+    """Запуск сервера, отдающего страницу частями, и загрузка ее ботом."""
+    async def handler(request):
+        response = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+        await response.prepare(request)
+        try:
+            for start in range(0, len(page), CHUNK_SIZE):
+                await response.write(page[start:start + CHUNK_SIZE])
+                sent[0] += len(page[start:start + CHUNK_SIZE])
+                await asyncio.sleep(0)
+        except ConnectionResetError:
+            pass
+        return response
+
+    app = web.Application()
+    app.router.add_get("/product", handler)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        await bot.http_client.start()
+        async with bot.http_client.session.get(server.make_url("/product")) as response:
+            return await bot.read_product_info_streaming(str(response.url), response)
+    finally:
+        await bot.http_client.close()
+        await server.close()
+
+
+def test_streaming_stops_after_markers(bot_module):
+    page = padded("product_simple.html")
+    sent = [0]
+    bytes_before = bot_module.http_client.bytes_read
+    product_info, body = asyncio.run(serve(bot_module, page, sent))
+    bytes_read = bot_module.http_client.bytes_read - bytes_before
+
+    assert product_info == {"name": "Смартфон Apple iPhone 15 128 ГБ, черный", "price": 79990}
+    assert body == b""
+    # Прочитано не больше части с маркерами и одного-двух буферов сокета, а не 2 МБ
+    assert bytes_read < 256 * 1024, bytes_read
+    assert sent[0] < len(page)
+
+
+def test_streaming_returns_whole_page_when_markers_missed(bot_module):
+    page = padded("product_attr_gt.html")
+    sent = [0]
+    product_info, body = asyncio.run(serve(bot_module, page, sent))
+
+    assert product_info is None
+    assert body == page
+    # Полный разбор получает всю страницу и находит товар через BeautifulSoup
+    result = asyncio.run(bot_module.parser_pool.extract(body))
+    assert result == {"name": "Пылесос Dreame T20", "price": 15990}